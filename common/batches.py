@@ -0,0 +1,28 @@
+# Batched processing of big inputs, shared by the scanners (set1/4.py and
+# common/ecb_scan.py)
+# - lines are read batch_size at a time, and batches are optionally spread
+#   over a process pool with only a few in flight, so memory stays flat
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+
+def iter_batches(lines, batch_size: int):
+  it = iter(lines)
+  while batch := list(itertools.islice(it, batch_size)):
+    yield batch
+
+
+def map_batches(fn, batches, workers: int = None):
+  """ map(fn, batches), in order, on a process pool if workers > 1 """
+  if not workers or workers < 2:
+    yield from map(fn, batches)
+    return
+  # only keep a few batches in flight so we never read the whole input
+  with ProcessPoolExecutor(workers) as executor:
+    pending = []
+    for batch in batches:
+      pending.append(executor.submit(fn, batch))
+      if len(pending) >= 2 * workers:
+        yield pending.pop(0).result()
+    for future in pending:
+      yield future.result()
@@ -0,0 +1,189 @@
+# CBC mode built from AES in ECB mode (set 2, challenge 10), shared by the
+# challenges that need it.
+#
+# CBC mode: each plaintext block is XORed with the previous ciphertext block
+# (the IV for the first one) before being encrypted with ECB. Encrypting has
+# to go block by block, but decrypting doesn't - all the ECB decryptions are
+# independent, so they're done in one call and XORed with the ciphertext
+# shifted by one block.
+import argparse
+import mmap
+import sys
+from functools import lru_cache
+
+from Crypto.Cipher import AES
+
+from common.padding import pad, remove_padding
+from common.xor import xor_bytes
+
+# how much to decrypt per ECB call, so big inputs don't need big temporaries
+CHUNK_SIZE = 1 << 20
+
+
+@lru_cache(maxsize=32)
+def ecb_cipher(key: bytes):
+  # ECB has no state between calls, so expand the key schedule once and reuse
+  # the cipher for every block
+  return AES.new(key, AES.MODE_ECB)
+
+
+def _check(data, key, iv, name: str):
+  if len(iv) != len(key):
+    raise ValueError("IV must be same length as key")
+  if len(data) % len(key) != 0:
+    raise ValueError(f"{name} must be multiple of key length")
+
+
+def encrypt_cbc(plaintext, key, iv):
+  _check(plaintext, key, iv, "Plaintext")
+
+  block_size = len(key)
+  encrypt = ecb_cipher(bytes(key)).encrypt
+  from_bytes = int.from_bytes
+  pt = memoryview(plaintext).cast("B")
+  ciphertext = bytearray(len(pt))
+  out = memoryview(ciphertext)
+  # this loop is the whole cost of encrypting, so the chaining block is kept
+  # as an int and everything it uses is a local
+  prev = from_bytes(iv, "little")
+  for start in range(0, len(pt), block_size):
+    end = start + block_size
+    # xor plaintext block with previous ciphertext block, encrypt using ECB
+    block = from_bytes(pt[start:end], "little") ^ prev
+    block = encrypt(block.to_bytes(block_size, "little"))
+    out[start:end] = block
+    prev = from_bytes(block, "little")
+  return bytes(ciphertext)
+
+
+def decrypt_cbc(ciphertext, key, iv, chunk_size: int = CHUNK_SIZE):
+  _check(ciphertext, key, iv, "Ciphertext")
+
+  block_size = len(key)
+  cipher = ecb_cipher(bytes(key))
+  ct = memoryview(ciphertext).cast("B")
+  plaintext = bytearray(len(ct))
+  out = memoryview(plaintext)
+  chunk_size = max(block_size, chunk_size - chunk_size % block_size)
+  for start in range(0, len(ct), chunk_size):
+    end = min(start + chunk_size, len(ct))
+    # decrypt a whole chunk of blocks using ECB
+    cipher.decrypt(ct[start:end], output=out[start:end])
+    # xor each block with the previous ciphertext block (the IV for the first)
+    if start == 0:
+      xor_bytes(out[:block_size], iv, out[:block_size])
+      start = block_size
+    xor_bytes(out[start:end], ct[start - block_size:end - block_size],
+              out[start:end])
+  return bytes(plaintext)
+
+
+def read_chunks(f, chunk_size: int = CHUNK_SIZE):
+  """ Yield chunks of a binary file, reading into one reused buffer.
+
+  Each chunk is a view of that buffer, so it's only valid until the next one
+  is requested - the stream functions below are fine with that.
+  """
+  buf = bytearray(chunk_size)
+  view = memoryview(buf)
+  while n := f.readinto(buf):
+    yield view[:n]
+
+
+def map_chunks(f, chunk_size: int = CHUNK_SIZE):
+  """ Yield chunks of a (real, seekable) file by memory mapping it """
+  size = f.seek(0, 2)
+  if size == 0:
+    return
+  with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+    for start in range(0, size, chunk_size):
+      yield mapped[start:start + chunk_size]
+
+
+def encrypt_cbc_stream(chunks, key, iv, padding: bool = True):
+  """ Encrypt an iterable of plaintext chunks, yielding ciphertext chunks.
+
+  The chunks can be any size, partial blocks are carried over to the next
+  chunk and the last ciphertext block is carried over as the IV. PKCS#7
+  padding is only added at the very end, so memory use doesn't depend on
+  the size of the input.
+  """
+  block_size = len(key)
+  carry = b""
+  for chunk in chunks:
+    data = carry + chunk if carry else chunk
+    usable = len(data) - len(data) % block_size
+    if usable:
+      ciphertext = encrypt_cbc(data[:usable], key, iv)
+      iv = ciphertext[-block_size:]
+      yield ciphertext
+    carry = bytes(data[usable:])
+  if padding:
+    carry = pad(carry, block_size)
+  if carry:
+    yield encrypt_cbc(carry, key, iv)
+
+
+def decrypt_cbc_stream(chunks, key, iv, padding: bool = True):
+  """ Decrypt an iterable of ciphertext chunks, yielding plaintext chunks.
+
+  Same idea as encrypt_cbc_stream, but the last block is always held back
+  until the input runs out, so the padding can be checked and removed.
+  """
+  block_size = len(key)
+  carry = b""
+  for chunk in chunks:
+    data = carry + chunk if carry else chunk
+    usable = len(data) - len(data) % block_size
+    if padding and usable and usable == len(data):
+      usable -= block_size # could be the last block, hang on to it
+    if usable:
+      yield decrypt_cbc(data[:usable], key, iv)
+      iv = bytes(data[usable - block_size:usable])
+    carry = bytes(data[usable:])
+  if len(carry) % block_size != 0:
+    raise ValueError("Ciphertext must be multiple of key length")
+  if carry:
+    plaintext = decrypt_cbc(carry, key, iv)
+    yield remove_padding(plaintext, block_size) if padding else plaintext
+  elif padding:
+    raise ValueError("Invalid padding")
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Encrypt or decrypt a file with AES-CBC in constant memory")
+  parser.add_argument("mode", choices=["encrypt", "decrypt"])
+  parser.add_argument("input", help="input file, - for stdin")
+  parser.add_argument("output", help="output file, - for stdout")
+  parser.add_argument("--key", required=True, help="key as hex")
+  parser.add_argument("--iv", help="IV as hex (default all zeros)")
+  parser.add_argument("--no-padding", action="store_true",
+                      help="don't add/remove PKCS#7 padding")
+  parser.add_argument("--mmap", action="store_true",
+                      help="memory map the input instead of reading it")
+  parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+  args = parser.parse_args()
+
+  key = bytes.fromhex(args.key)
+  iv = bytes.fromhex(args.iv) if args.iv else bytes(len(key))
+  stream = encrypt_cbc_stream if args.mode == "encrypt" else decrypt_cbc_stream
+
+  fin = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+  fout = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+  try:
+    if args.mmap:
+      chunks = map_chunks(fin, args.chunk_size)
+    else:
+      chunks = read_chunks(fin, args.chunk_size)
+    for out in stream(chunks, key, iv, not args.no_padding):
+      fout.write(out)
+  finally:
+    if fin is not sys.stdin.buffer:
+      fin.close()
+    if fout is not sys.stdout.buffer:
+      fout.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,174 @@
+# CTR mode (set 3, challenge 18), shared by the fixed-nonce challenges.
+#
+# The keystream is AES-ECB of a running counter: each counter block is 8 zero
+# bytes followed by the 64-bit little endian block count, which starts at
+# nonce. Every block of keystream is independent, so instead of one AES call
+# per block all the counter blocks for a chunk are built in one buffer and
+# encrypted together, and any byte offset can be jumped to directly.
+import argparse
+import mmap
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from common.cbc import ecb_cipher
+from common.lru import LRUCache
+from common.xor import xor_bytes
+
+BLOCK_SIZE = 16
+# how much keystream to make at a time
+CHUNK_SIZE = 1 << 20
+# how much of a file each worker gets at a time in ctr_encrypt_file
+SEGMENT_SIZE = 1 << 26
+
+
+def counter_blocks(nonce: int, start: int, count: int) -> bytes:
+  """ The counter blocks for block numbers start to start + count - 1 """
+  # two 64-bit words per block, the first is always zero
+  counters = array("Q", bytes(BLOCK_SIZE * count))
+  counters[1::2] = array("Q", range(nonce + start, nonce + start + count))
+  if sys.byteorder != "little":
+    counters.byteswap()
+  return counters.tobytes()
+
+
+def ctr_keystream(key: bytes, nonce: int = 0, start: int = 0,
+                  count: int = 1) -> bytes:
+  """ count blocks of keystream, starting at block number start """
+  return ecb_cipher(bytes(key)).encrypt(counter_blocks(nonce, start, count))
+
+
+class KeystreamCache:
+  """ LRU cache of keystream, for lots of messages under the same key/nonce.
+
+  Keystream is kept in segments of segment_blocks blocks, keyed by the key
+  and the segment's first counter value (so it doesn't matter which nonce a
+  message started at). Least recently used segments are dropped once more
+  than memory_budget bytes are held. hits / misses / evictions count
+  segment lookups, to help pick a budget.
+  """
+
+  def __init__(self, memory_budget: int = 1 << 24, segment_blocks: int = 64):
+    self.segment_blocks = segment_blocks
+    self._segments = LRUCache(max_bytes=memory_budget)
+
+  def _segment(self, key: bytes, index: int) -> memoryview:
+    cache_key = (key, index)
+    segment = self._segments.get(cache_key)
+    if segment is None:
+      segment = memoryview(ctr_keystream(
+        key, 0, index * self.segment_blocks, self.segment_blocks))
+      self._segments.put(cache_key, segment, len(segment))
+    return segment
+
+  def keystream(self, key: bytes, nonce: int = 0, start: int = 0,
+                count: int = 1) -> bytes:
+    """ Same as ctr_keystream, but from (and into) the cache """
+    key = bytes(key)
+    first = nonce + start
+    last = first + count
+    per = self.segment_blocks
+    parts = []
+    for index in range(first // per, (last - 1) // per + 1):
+      lo = max(first, index * per) - index * per
+      hi = min(last, (index + 1) * per) - index * per
+      parts.append(self._segment(key, index)[lo * BLOCK_SIZE:hi * BLOCK_SIZE])
+    return b"".join(parts)
+
+  def stats(self) -> dict:
+    return self._segments.stats()
+
+
+def ctr_encrypt(
+    pt_or_ct: bytes = None,
+    key: bytes = None,
+    nonce: int = 0,
+    offset: int = 0,
+    cache: KeystreamCache = None) -> bytes:
+  """ Encrypt or decrypt (it's the same thing) using AES in CTR mode.
+
+  offset is the position of pt_or_ct in the stream, in bytes, so part of a
+  message can be decrypted without touching anything before it. Pass a
+  KeystreamCache to reuse keystream between calls with the same key/nonce.
+  """
+  keystream_for = ctr_keystream if cache is None else cache.keystream
+  data = memoryview(pt_or_ct).cast("B")
+  result = bytearray(len(data))
+  out = memoryview(result)
+  pos = 0
+  while pos < len(data):
+    # keystream for this chunk starts in the block holding offset + pos
+    block, skip = divmod(offset + pos, BLOCK_SIZE)
+    n = min(len(data) - pos, CHUNK_SIZE - skip)
+    num_blocks = (skip + n + BLOCK_SIZE - 1) // BLOCK_SIZE
+    keystream = memoryview(keystream_for(key, nonce, block, num_blocks))
+    xor_bytes(data[pos:pos + n], keystream[skip:skip + n], out[pos:pos + n])
+    pos += n
+  return bytes(result)
+
+
+def _ctr_segment(job) -> int:
+  # encrypt bytes start:end of one file into the same place in another, both
+  # memory mapped, so workers never need to send data back
+  in_path, out_path, key, nonce, start, end = job
+  with open(in_path, "rb") as fin, open(out_path, "r+b") as fout:
+    with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as src, \
+         mmap.mmap(fout.fileno(), 0) as dst:
+      for pos in range(start, end, CHUNK_SIZE):
+        stop = min(pos + CHUNK_SIZE, end)
+        dst[pos:stop] = ctr_encrypt(src[pos:stop], key, nonce, offset=pos)
+  return end - start
+
+
+def ctr_encrypt_file(
+    in_path: str,
+    out_path: str,
+    key: bytes,
+    nonce: int = 0,
+    workers: int = None,
+    segment_size: int = SEGMENT_SIZE,
+    threads: bool = False) -> int:
+  """ Encrypt or decrypt a whole file with CTR, in parallel.
+
+  The file is split into segments on block boundaries and each one is
+  handled by a worker, which works out its own counter from the segment's
+  offset and writes straight into the (memory mapped) output file. Uses
+  processes by default, threads=True uses threads instead (AES itself runs
+  without the GIL, the XOR doesn't). Returns the number of bytes written.
+  The output can't be the input file, opening it truncates it.
+  """
+  if os.path.exists(out_path) and os.path.samefile(in_path, out_path):
+    raise ValueError("in_path and out_path are the same file")
+  size = os.path.getsize(in_path)
+  with open(out_path, "wb") as f:
+    f.truncate(size)
+  if size == 0:
+    return 0
+  segment_size = max(BLOCK_SIZE, segment_size - segment_size % BLOCK_SIZE)
+  jobs = [(in_path, out_path, bytes(key), nonce, start,
+           min(start + segment_size, size))
+          for start in range(0, size, segment_size)]
+  executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+  with executor(workers) as pool:
+    return sum(pool.map(_ctr_segment, jobs))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Encrypt or decrypt a file with AES-CTR using all cores")
+  parser.add_argument("input")
+  parser.add_argument("output")
+  parser.add_argument("--key", required=True, help="key as hex")
+  parser.add_argument("--nonce", type=int, default=0)
+  parser.add_argument("--workers", type=int, default=None)
+  parser.add_argument("--segment-size", type=int, default=SEGMENT_SIZE)
+  parser.add_argument("--threads", action="store_true")
+  args = parser.parse_args()
+  ctr_encrypt_file(
+    args.input, args.output, bytes.fromhex(args.key), args.nonce,
+    args.workers, args.segment_size, args.threads)
+
+
+if __name__ == "__main__":
+  main()
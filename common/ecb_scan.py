@@ -0,0 +1,104 @@
+# Scan lots of hex encoded ciphertexts for signs of ECB mode
+# - ECB encrypts each block independently, so repeated plaintext blocks show
+#   up as repeated ciphertext blocks; each record gets a repetition score
+#   (the fraction of its blocks that are repeats) rather than just a yes/no
+# - records are streamed in batches (from files or stdin) and the batches are
+#   spread over a process pool, so memory stays flat whatever the input size
+import argparse
+import binascii
+import itertools
+import sys
+from functools import partial
+
+from common.batches import iter_batches, map_batches
+
+BLOCK_SIZE = 16
+
+
+def repetition(cipher, block_size: int = BLOCK_SIZE) -> tuple:
+  """ Returns (repeated blocks, total blocks) for cipher
+
+  Any trailing partial block is ignored. Blocks are memoryview slices, which
+  hash by content, so no copies of the blocks are made. Only read-only views
+  hash though, so a writable buffer (eg a bytearray) is copied to bytes once.
+  """
+  view = memoryview(cipher)
+  if not view.readonly:
+    view = memoryview(bytes(view))
+  blocks = len(view) // block_size
+  unique = {view[i:i + block_size]
+            for i in range(0, blocks * block_size, block_size)}
+  return blocks - len(unique), blocks
+
+
+def repetition_score(cipher, block_size: int = BLOCK_SIZE) -> float:
+  repeated, blocks = repetition(cipher, block_size)
+  return repeated / blocks if blocks else 0.0
+
+
+def scan_batch(lines: list, block_size: int = BLOCK_SIZE,
+               min_repeats: int = 1) -> list:
+  """ Returns (index in batch, repeated, blocks, hex) for the records in the
+  batch with at least min_repeats repeated blocks. Blank lines are skipped
+  (but still counted, so indexes match line numbers).
+  """
+  results = []
+  for i, line in enumerate(lines):
+    line = line.strip()
+    if not line:
+      continue
+    # unhexlify takes bytes or str, so binary input never gets decoded
+    repeated, blocks = repetition(binascii.unhexlify(line), block_size)
+    if repeated >= min_repeats:
+      if isinstance(line, bytes):
+        line = line.decode("ascii")
+      results.append((i, repeated, blocks, line))
+  return results
+
+
+def scan(lines, block_size: int = BLOCK_SIZE, min_repeats: int = 1,
+         batch_size: int = 4096, workers: int = None):
+  """ Find the records that are probably ECB encrypted.
+
+  lines can be any iterable of hex records (str or bytes, eg a file opened
+  in "rb" mode). Yields (line index, score, repeated, blocks, hex) in input
+  order for every record with at least min_repeats repeated blocks.
+  """
+  fn = partial(scan_batch, block_size=block_size, min_repeats=min_repeats)
+  # every batch but the last is full, so batch n starts at n * batch_size
+  batches = map_batches(fn, iter_batches(lines, batch_size), workers)
+  for start, results in zip(itertools.count(0, batch_size), batches):
+    for i, repeated, blocks, hexstr in results:
+      yield (start + i, repeated / blocks if blocks else 0.0,
+             repeated, blocks, hexstr)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Find hex encoded ciphertexts that are probably AES-ECB")
+  parser.add_argument(
+    "inputs", nargs="*", default=["-"],
+    help="files with one hex ciphertext per line, - for stdin")
+  parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+  parser.add_argument("--min-repeats", type=int, default=1,
+                      help="only report records with this many repeats")
+  parser.add_argument("--all", action="store_true",
+                      help="report every record, even with no repeats")
+  parser.add_argument("--batch-size", type=int, default=4096)
+  parser.add_argument("--workers", type=int, default=None)
+  args = parser.parse_args()
+
+  min_repeats = 0 if args.all else args.min_repeats
+  for name in args.inputs:
+    f = sys.stdin.buffer if name == "-" else open(name, "rb")
+    try:
+      for index, score, repeated, blocks, hexstr in scan(
+          f, args.block_size, min_repeats, args.batch_size, args.workers):
+        print(f"{name}:{index + 1} {score:.3f} {repeated}/{blocks} {hexstr}")
+    finally:
+      if f is not sys.stdin.buffer:
+        f.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,129 @@
+# Frequency models for scoring how much some bytes look like (english) text.
+#
+# A model is compiled once (from a letter -> frequency map, or by counting a
+# corpus) into a 256 entry weight table, plus optional tables of letter pair
+# and triple log probabilities, and can be saved to / loaded from disk.
+import json
+import math
+from collections import Counter
+
+
+def _lowered(bstr) -> bytes:
+  # bytes.lower only touches A-Z, same as the scoring has always done
+  if not isinstance(bstr, (bytes, bytearray)):
+    bstr = bytes(bstr)
+  return bstr.lower()
+
+
+def _count_ngrams(bstr: bytes, n: int) -> Counter:
+  # zip of shifted copies gives every run of n bytes as a tuple, and Counter
+  # does the counting in C
+  return Counter(zip(*[bstr[i:] for i in range(n)]))
+
+
+class FrequencyModel:
+  """ Letter frequencies compiled for fast scoring.
+
+  weights[b] is how much byte b adds to the score (uppercase letters count
+  as lowercase). ngrams maps n (2 for pairs, 3 for triples) to a dict of
+  {tuple of lowercased bytes: log10 probability}, and ngram_floor is the log
+  probability used for anything not in there.
+  """
+
+  def __init__(self, weights: list, ngrams: dict = None,
+               ngram_floor: dict = None):
+    if len(weights) != 256:
+      raise ValueError("weights must have an entry for every byte value")
+    self.weights = list(weights)
+    self.ngrams = ngrams or {}
+    self.ngram_floor = ngram_floor or {}
+
+  @classmethod
+  def from_map(cls, frequency_map: dict):
+    """ Model from a {character: frequency} map like common.utils.LETTER_FREQ """
+    return cls([frequency_map.get(chr(b), 0)
+                for b in bytes(range(256)).lower()])
+
+  @classmethod
+  def from_corpus(cls, corpus, max_n: int = 1):
+    """ Train a model by counting the (lowercased) bytes of some text.
+
+    With max_n > 1, tables of log probabilities for runs of up to max_n
+    bytes are built too.
+    """
+    if isinstance(corpus, str):
+      corpus = corpus.encode()
+    corpus = _lowered(corpus)
+    total = len(corpus) or 1
+    counts = Counter(corpus)
+    model = cls([counts[b] / total for b in bytes(range(256)).lower()])
+    for n in range(2, max_n + 1):
+      grams = _count_ngrams(corpus, n)
+      total = sum(grams.values()) or 1
+      model.ngrams[n] = {
+        gram: math.log10(count / total) for gram, count in grams.items()}
+      # unseen runs get a small fraction of a count
+      model.ngram_floor[n] = math.log10(0.01 / total)
+    return model
+
+  def score(self, bstr) -> float:
+    """ Sum of the weights of every byte (same as common.utils.score) """
+    weights = self.weights
+    return sum([weights[b] * count for b, count in Counter(bstr).items()])
+
+  def key_scores(self, bstr) -> list:
+    """ score(xor(bstr, key)) for all 256 single byte keys.
+
+    xor'ing with key just moves the count of byte b to b ^ key, so this is
+    one histogram of bstr and a 256x256 product that doesn't depend on the
+    length of bstr.
+    """
+    weights = self.weights
+    counts = list(Counter(bstr).items())
+    return [sum([c * weights[b ^ key] for b, c in counts])
+            for key in range(256)]
+
+  def ngram_score(self, bstr, n: int = 2) -> float:
+    """ Log10 likelihood of bstr under the n-gram table (higher is better) """
+    if n not in self.ngrams:
+      raise ValueError(f"model has no {n}-gram table")
+    table, floor = self.ngrams[n], self.ngram_floor[n]
+    return sum([table.get(gram, floor) * count
+                for gram, count in _count_ngrams(_lowered(bstr), n).items()])
+
+  def to_dict(self) -> dict:
+    return {
+      "weights": self.weights,
+      # json keys have to be strings, so store the byte runs as hex
+      "ngrams": {
+        str(n): {bytes(gram).hex(): logp for gram, logp in table.items()}
+        for n, table in self.ngrams.items()},
+      "ngram_floor": {str(n): f for n, f in self.ngram_floor.items()},
+    }
+
+  @classmethod
+  def from_dict(cls, data: dict):
+    return cls(
+      data["weights"],
+      {int(n): {tuple(bytes.fromhex(gram)): logp
+                for gram, logp in table.items()}
+       for n, table in data.get("ngrams", {}).items()},
+      {int(n): f for n, f in data.get("ngram_floor", {}).items()})
+
+  def save(self, path):
+    with open(path, "w") as f:
+      json.dump(self.to_dict(), f)
+
+  @classmethod
+  def load(cls, path):
+    with open(path, "r") as f:
+      return cls.from_dict(json.load(f))
+
+
+def as_model(frequency_map=None, default: FrequencyModel = None):
+  """ Turn whatever was passed as a frequency_map into a FrequencyModel """
+  if frequency_map is None:
+    return default
+  if isinstance(frequency_map, FrequencyModel):
+    return frequency_map
+  return FrequencyModel.from_map(frequency_map)
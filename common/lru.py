@@ -0,0 +1,65 @@
+# Bounded LRU cache, shared by the caches in front of slow things
+# (common.ctr.KeystreamCache and common.oracle.CachedOracle)
+from collections import OrderedDict
+
+
+class LRUCache:
+  """ LRU cache bounded by max_entries and by max_bytes (None for no bound).
+
+  Every entry is put with its size in bytes, and the least recently used
+  ones are dropped once either bound is passed. get() counts hits and
+  misses, put() evictions, to help pick the bounds - see stats().
+  """
+
+  def __init__(self, max_entries: int = None, max_bytes: int = None):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._entries = OrderedDict() # key -> (value, size)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __contains__(self, key) -> bool:
+    return key in self._entries
+
+  def get(self, key):
+    """ The value for key (which is now the most recently used), or None """
+    entry = self._entries.get(key)
+    if entry is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self._entries.move_to_end(key)
+    return entry[0]
+
+  def put(self, key, value, size: int):
+    old = self._entries.pop(key, None)
+    if old is not None:
+      self.size -= old[1]
+    self._entries[key] = (value, size)
+    self.size += size
+    # always keep the one we just added, even if it's over budget on its own
+    while len(self._entries) > 1 and self._over_budget():
+      _, (_, dropped) = self._entries.popitem(last=False)
+      self.size -= dropped
+      self.evictions += 1
+
+  def _over_budget(self) -> bool:
+    return ((self.max_entries is not None
+             and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.size > self.max_bytes))
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+      "entries": len(self._entries),
+      "bytes": self.size,
+    }
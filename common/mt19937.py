@@ -0,0 +1,354 @@
+# MT19937 (set 3, challenge 21), shared by the challenges that need it
+# https://en.wikipedia.org/wiki/Mersenne_Twister
+# - the state is an array('I') and the twist is done a slice at a time (see
+#   _twist) instead of one element at a time with % n indexing
+# - each block of 624 outputs is tempered all at once, right after the twist,
+#   so extract_number is just an index and extract_many a slice
+# - seed_mt is the reference init_genrand, seed_by_array is init_by_array,
+#   which is what CPython's random.seed(int) uses - see from_python_seed
+import sys
+from array import array
+
+
+def _temper_all(values) -> list:
+  # same steps as MT19937._temper, for all the values in one comprehension
+  # (the := chain is the four steps in order, it's a lot quicker than four
+  # passes or a function call per value)
+  u, s, b, t, c, l = (
+    MT19937.u, MT19937.s, MT19937.b, MT19937.t, MT19937.c, MT19937.l)
+  return [
+    (y := (y := (y := x ^ (x >> u)) ^ ((y << s) & b)) ^ ((y << t) & c))
+    ^ (y >> l)
+    for x in values]
+
+
+class MT19937:
+
+  # buncha constants
+  f = 1812433253
+  w, n, m, r = 32, 624, 397, 31
+  a = 0x9908B0DF
+  u, d = 11, 0xFFFFFFFF
+  s, b = 7, 0x9D2C5680
+  t, c = 15, 0xEFC60000
+  l = 18
+
+  # masking for 32 bit ints
+  lower_mask = (1 << r) - 1
+  upper_mask = 1 << r
+  word_mask = (1 << w) - 1
+
+  def __init__(self, seed: int = None):
+    self._mt = array("I", bytes(4 * self.n)) # state
+    self._out = [] # tempered state, what extract_number hands out
+    self._out_mask = self.word_mask # only narrower for seed_legacy(bits=31)
+    # index, n + 1 means never seeded
+    self.index = self.n + 1
+    if seed is not None:
+      self.seed_mt(seed)
+
+  @classmethod
+  def from_python_seed(cls, seed: int) -> "MT19937":
+    """ Same outputs as random.Random(seed).getrandbits(32) for an int seed """
+    # CPython splits abs(seed) into 32 bit words, least significant first
+    seed = abs(seed)
+    key = []
+    while True:
+      key.append(seed & cls.word_mask)
+      seed >>= 32
+      if not seed:
+        break
+    mt = cls()
+    mt.seed_by_array(key)
+    return mt
+
+  @property
+  def MT(self) -> array:
+    return self._mt
+
+  @MT.setter
+  def MT(self, values):
+    # eg to clone a generator from (untempered) outputs
+    self._mt = array("I", values)
+    self._out = self._tempered(self._mt)
+
+  def seed_mt(self, seed: int):
+    # Initialize the generator from a seed (init_genrand)
+    mt = [seed & self.word_mask]
+    prev = mt[0]
+    for i in range(1, self.n):
+      prev = (self.f * (prev ^ (prev >> (self.w - 2))) + i) & self.word_mask
+      mt.append(prev)
+    self._mt = array("I", mt)
+    self._out_mask = self.word_mask
+    self.index = self.n
+
+  def seed_legacy(self, seed: int, bits: int = 32):
+    """ The seeding the set 3 scripts used before seed_mt, to reproduce
+    their old outputs: MT[i] = f * ((MT[i-1] ^ (MT[i-1] >> 30)) + i), with
+    the + i inside the multiply, kept to bits bits.
+
+    23.py used 32 bits. 21.py and 24.py used 31 and also cut every output
+    down to 31 bits, which bits=31 does as well.
+    """
+    mask = (1 << bits) - 1
+    mt = [seed & self.word_mask]
+    prev = mt[0]
+    for i in range(1, self.n):
+      prev = (self.f * ((prev ^ (prev >> (self.w - 2))) + i)) & mask
+      mt.append(prev)
+    self._mt = array("I", mt)
+    self._out_mask = mask
+    self.index = self.n
+
+  def seed_by_array(self, key: list):
+    # init_by_array from the reference implementation (and CPython)
+    self.seed_mt(19650218)
+    mt = self._mt.tolist()
+    n, mask = self.n, self.word_mask
+    i, j = 1, 0
+    for _ in range(max(n, len(key))):
+      mt[i] = ((mt[i] ^ ((mt[i - 1] ^ (mt[i - 1] >> 30)) * 1664525))
+               + key[j] + j) & mask
+      i += 1
+      j += 1
+      if i >= n:
+        mt[0] = mt[n - 1]
+        i = 1
+      if j >= len(key):
+        j = 0
+    for _ in range(n - 1):
+      mt[i] = ((mt[i] ^ ((mt[i - 1] ^ (mt[i - 1] >> 30)) * 1566083941))
+               - i) & mask
+      i += 1
+      if i >= n:
+        mt[0] = mt[n - 1]
+        i = 1
+    mt[0] = 0x80000000 # MSB is 1, assuring non-zero initial array
+    self._mt = array("I", mt)
+    self.index = n
+
+  def extract_number(self) -> int:
+    if self.index >= self.n:
+      if self.index > self.n:
+        raise Exception("Generator was never seeded")
+      self._twist()
+    y = self._out[self.index]
+    self.index += 1
+    return y
+
+  def extract_many(self, count: int) -> list:
+    """ The next count outputs of extract_number, as a list """
+    if self.index > self.n:
+      raise Exception("Generator was never seeded")
+    res = []
+    while count > 0:
+      if self.index >= self.n:
+        self._twist()
+      take = min(count, self.n - self.index)
+      res.extend(self._out[self.index:self.index + take])
+      self.index += take
+      count -= take
+    return res
+
+  def _twist(self):
+    # element i of the new state needs old i + 1 and new i + m - n (after
+    # wrapping), so in blocks of n - m elements every input is either all
+    # old or all already updated - each block is one pass over slices
+    mt = self._mt
+    n, m = self.n, self.m
+    upper, lower = self.upper_mask, self.lower_mask
+    mag = (0, self.a)
+    for lo, hi in ((0, n - m), (n - m, 2 * (n - m)), (2 * (n - m), n - 1)):
+      # mt[i + m] for the first block, mt[i + m - n] (new) for the others
+      src = lo + m if lo + m < n else lo + m - n
+      mt[lo:hi] = array("I", [
+        x ^ (((y & upper) | (z & lower)) >> 1) ^ mag[z & 1]
+        for x, y, z in zip(
+          mt[src:src + hi - lo], mt[lo:hi], mt[lo + 1:hi + 1])])
+    # the last one wraps around to the (new) first
+    y = (mt[n - 1] & upper) | (mt[0] & lower)
+    mt[n - 1] = mt[m - 1] ^ (y >> 1) ^ mag[y & 1]
+    self._out = self._tempered(mt)
+    self.index = 0
+
+  def _tempered(self, mt) -> list:
+    out = _temper_all(mt)
+    if self._out_mask != self.word_mask:
+      mask = self._out_mask
+      out = [x & mask for x in out]
+    return out
+
+  def _temper(self, y) -> int:
+    # temper the output
+    y ^= (( y >> self.u) & self.d)
+    y ^= (( y << self.s) & self.b)
+    y ^= (( y << self.t) & self.c)
+    y ^= ( y >> self.l)
+    return y & ((1 << self.w) - 1)
+
+  def getrandbits(self, k: int) -> int:
+    # get k random bits
+    if k <= 0:
+      raise ValueError("number of bits must be greater than zero")
+    if k <= 32:
+      # just get the last k bits of the number
+      return self.extract_number() & ((1 << k) - 1)
+    # we need to get more than 32 bits so we need to get
+    # multiple random numbers
+    res = 0
+    for x in self.extract_many(k // 32):
+      res <<= 32
+      res |= x
+    return res & ((1 << k) - 1)
+
+  def python_getrandbits(self, k: int) -> int:
+    """ Same as CPython's random.getrandbits(k): the top bits for k < 32,
+    and words least significant first for more """
+    if k <= 0:
+      raise ValueError("number of bits must be greater than zero")
+    if k <= 32:
+      return self.extract_number() >> (32 - k)
+    words = self.extract_many((k + 31) // 32)
+    if k % 32:
+      words[-1] >>= 32 - k % 32
+    res = 0
+    for i, x in enumerate(words):
+      res |= x << (32 * i)
+    return res
+
+
+class MultiMT19937:
+  """ One MT19937 per seed, all run side by side - for brute forcing seeds.
+
+  The state of every generator is packed into the 64 bit "lanes" of Python
+  ints, so state[i] holds element i of every generator, and one big int
+  operation steps all of them at once (SIMD within a register, with the
+  register as wide as we like). Values are 32 bits, and the multiplies in
+  the seeding are by constants < 2**32, so nothing carries from one lane
+  into the next; shifts right do pull bits in from the next lane, those get
+  masked off.
+
+  With python_seed, seeding is the same as random.seed(seed) in CPython
+  (init_by_array), otherwise it's seed_mt (init_genrand). Seeds have to fit
+  in 32 bits either way.
+  """
+
+  LANE = 64
+
+  def __init__(self, seeds, python_seed: bool = False):
+    self.seeds = list(seeds)
+    if any(not 0 <= seed <= MT19937.word_mask for seed in self.seeds):
+      raise ValueError("seeds must be unsigned 32 bit ints")
+    lanes = len(self.seeds)
+    # ones has a 1 at the bottom of every lane, so v * ones is v in every
+    # lane, and the masks are the scalar masks in every lane
+    self.ones = int.from_bytes(
+      b"\x01\x00\x00\x00\x00\x00\x00\x00" * lanes, "little")
+    self.m32 = MT19937.word_mask * self.ones
+    self.upper = MT19937.upper_mask * self.ones
+    self.lower = MT19937.lower_mask * self.ones
+    self.b = MT19937.b * self.ones
+    self.c = MT19937.c * self.ones
+    packed = self.pack(self.seeds)
+    if python_seed:
+      self._seed_by_array(packed)
+    else:
+      self._seed_mt(packed)
+
+  def pack(self, values) -> int:
+    """ values[k] into lane k """
+    words = array("Q", values)
+    if sys.byteorder == "big":
+      words.byteswap()
+    return int.from_bytes(words.tobytes(), "little")
+
+  def _append_lanes(self, words: array, packed: int):
+    words.frombytes(packed.to_bytes(8 * len(self.seeds), "little"))
+
+  def unpack(self, packed: int) -> list:
+    """ lane values as a list, the inverse of pack """
+    words = array("Q")
+    self._append_lanes(words, packed)
+    if sys.byteorder == "big":
+      words.byteswap()
+    return words.tolist()
+
+  def _init_genrand(self, packed_seed: int) -> list:
+    f, ones, m32 = MT19937.f, self.ones, self.m32
+    mt = [packed_seed]
+    prev = packed_seed
+    for i in range(1, MT19937.n):
+      prev = (f * (prev ^ ((prev >> 30) & m32)) + i * ones) & m32
+      mt.append(prev)
+    return mt
+
+  def _seed_mt(self, packed_seed: int):
+    self.mt = self._init_genrand(packed_seed)
+    self.index = MT19937.n
+
+  def _seed_by_array(self, packed_seed: int):
+    # init_by_array with a one word key (the seed) for every lane - see
+    # MT19937.seed_by_array. The starting state is the same for all lanes.
+    n, ones, m32 = MT19937.n, self.ones, self.m32
+    base = MT19937()
+    base.seed_mt(19650218)
+    mt = [x * ones for x in base.MT]
+    i = 1
+    for _ in range(n):
+      prev = mt[i - 1]
+      mt[i] = ((mt[i] ^ ((prev ^ ((prev >> 30) & m32)) * 1664525))
+               + packed_seed) & m32
+      i += 1
+      if i >= n:
+        mt[0] = mt[n - 1]
+        i = 1
+    for _ in range(n - 1):
+      prev = mt[i - 1]
+      # add 2**32 - i rather than subtract i, so no lane ever borrows
+      mt[i] = ((mt[i] ^ ((prev ^ ((prev >> 30) & m32)) * 1566083941))
+               + ((1 << 32) - i) * ones) & m32
+      i += 1
+      if i >= n:
+        mt[0] = mt[n - 1]
+        i = 1
+    mt[0] = 0x80000000 * ones
+    self.mt = mt
+    self.index = n
+
+  def extract_packed(self) -> int:
+    """ The next output of every generator, packed """
+    n = MT19937.n
+    i = self.index if self.index < n else 0
+    # the twist is done an element at a time, as each one is needed - it's
+    # the same order as a whole twist, so the inputs are the same, and the
+    # first K outputs only cost K steps (not a whole twist) for K < 624
+    mt, m32 = self.mt, self.m32
+    y = (mt[i] & self.upper) | (mt[(i + 1) % n] & self.lower)
+    y = (mt[(i + MT19937.m) % n] ^ ((y >> 1) & m32)
+         ^ ((y & self.ones) * MT19937.a))
+    mt[i] = y
+    self.index = i + 1
+    y ^= (y >> MT19937.u) & m32
+    y ^= (y << MT19937.s) & self.b
+    y ^= (y << MT19937.t) & self.c
+    y ^= (y >> MT19937.l) & m32
+    return y
+
+  def extract_many(self, count: int) -> list:
+    """ The next count outputs of each generator, one array per seed """
+    words = array("Q")
+    for _ in range(count):
+      self._append_lanes(words, self.extract_packed())
+    if sys.byteorder == "big":
+      words.byteswap()
+    # words is [output][lane], so each seed's outputs are every lanes'th one
+    lanes = len(self.seeds)
+    return [words[k::lanes] for k in range(lanes)]
+
+
+def seed_batches(start: int, batch_size: int):
+  """ start, start - 1, ..., 1 in ranges of batch_size seeds, for feeding
+  MultiMT19937 when searching back from a time stamp """
+  for hi in range(start, 0, -batch_size):
+    yield range(hi, max(hi - batch_size, 0), -1)
@@ -0,0 +1,204 @@
+# Wrappers for the challenge 'oracles' (the closures that stand in for a
+# remote service), to see how hard an attack leans on them and to avoid
+# asking them the same thing twice
+import bisect
+import contextlib
+import hashlib
+import json
+import struct
+import time
+
+from common.lru import LRUCache
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, float("inf"))
+
+
+def _size(value) -> int:
+  """ Number of bytes in an oracle argument or result (0 for bools etc) """
+  if isinstance(value, (bytes, bytearray, memoryview)):
+    return memoryview(value).nbytes
+  if isinstance(value, str):
+    return len(value.encode())
+  if isinstance(value, (tuple, list)):
+    return sum([_size(v) for v in value])
+  return 0
+
+
+def _counters() -> dict:
+  return {"calls": 0, "bytes_sent": 0, "bytes_received": 0, "seconds": 0.0}
+
+
+class InstrumentedOracle:
+  """ Calls oracle and keeps count of what went back and forth.
+
+  Records the number of calls, bytes sent (all bytes / str arguments) and
+  received (the result), a histogram of call latencies, and the same
+  counters broken down by phase - see phase(). Everything is available as a
+  dict from stats(), or as JSON from to_json() / save().
+  """
+
+  def __init__(self, oracle: callable, name: str = None,
+               buckets: tuple = LATENCY_BUCKETS):
+    self.oracle = oracle
+    self.name = name or getattr(oracle, "__name__", "oracle")
+    self.buckets = tuple(buckets)
+    self.reset()
+
+  def reset(self):
+    self.totals = _counters()
+    self.latency = [0] * len(self.buckets)
+    self.phases = {}
+    self.current_phase = None
+
+  def __call__(self, *args, **kwargs):
+    start = time.perf_counter()
+    result = self.oracle(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    sent = _size(args) + _size(list(kwargs.values()))
+    received = _size(result)
+    counters = [self.totals]
+    if self.current_phase is not None:
+      counters.append(self.phases[self.current_phase])
+    for c in counters:
+      c["calls"] += 1
+      c["bytes_sent"] += sent
+      c["bytes_received"] += received
+      c["seconds"] += elapsed
+    self.latency[bisect.bisect_left(self.buckets, elapsed)] += 1
+    return result
+
+  @contextlib.contextmanager
+  def phase(self, name: str):
+    """ Count the calls made inside the with block under phase name """
+    self.phases.setdefault(name, _counters())
+    previous, self.current_phase = self.current_phase, name
+    try:
+      yield self
+    finally:
+      self.current_phase = previous
+
+  @property
+  def calls(self) -> int:
+    return self.totals["calls"]
+
+  def stats(self) -> dict:
+    return {
+      "name": self.name,
+      **self.totals,
+      "latency": {f"<={b:g}": n for b, n in zip(self.buckets, self.latency)},
+      "phases": {k: dict(v) for k, v in self.phases.items()},
+    }
+
+  def to_json(self, **kwargs) -> str:
+    return json.dumps(self.stats(), **kwargs)
+
+  def save(self, path: str):
+    with open(path, "w") as f:
+      f.write(self.to_json(indent=2))
+
+  def summary(self) -> str:
+    """ One line per phase, for printing at the end of an attack """
+    lines = []
+    for name, c in [(self.name, self.totals), *self.phases.items()]:
+      indent = "" if c is self.totals else "  "
+      lines.append(
+        f"{indent}{name}: {c['calls']} calls, {c['bytes_sent']} bytes sent, "
+        f"{c['bytes_received']} bytes received, {c['seconds']:.3f}s")
+    return "\n".join(lines)
+
+
+class CachedOracle:
+  """ Memoizes a deterministic oracle that takes and returns bytes.
+
+  Results are kept in an LRU cache, keyed by the input bytes, bounded by
+  max_entries and by max_bytes (of inputs + results). With path set, every
+  real query is also appended to a log file there, and whatever is already
+  in the log is loaded at startup - so an interrupted attack can be rerun
+  without asking the oracle again. The log only makes sense for the same
+  oracle (same key, prefix, etc), nothing checks that for you! A query that
+  is already in the log (eg loaded, evicted, then asked again) isn't
+  appended a second time.
+
+  Log records are the input and result lengths (little endian uint32s)
+  followed by the input and result. A partly written last record (eg from
+  being killed mid write) is dropped.
+  """
+
+  _header = struct.Struct("<II")
+
+  def __init__(self, oracle: callable, max_entries: int = 1 << 16,
+               max_bytes: int = 1 << 28, path: str = None):
+    self.oracle = oracle
+    self._entries = LRUCache(max_entries, max_bytes)
+    self._log = None
+    self._logged = set() # digests of the queries in the log
+    if path is not None:
+      self._load(path)
+      self._log = open(path, "ab")
+
+  def _load(self, path: str):
+    try:
+      f = open(path, "rb")
+    except FileNotFoundError:
+      return
+    with f:
+      data = f.read()
+    pos = 0
+    while pos + self._header.size <= len(data):
+      n_in, n_out = self._header.unpack_from(data, pos)
+      end = pos + self._header.size + n_in + n_out
+      if end > len(data):
+        break
+      query = data[pos + self._header.size:end - n_out]
+      self._store(query, data[end - n_out:end])
+      self._logged.add(self._digest(query))
+      pos = end
+    if pos < len(data):
+      # chop off the partial record, so new ones line up
+      with open(path, "r+b") as f:
+        f.truncate(pos)
+
+  @staticmethod
+  def _digest(query: bytes) -> bytes:
+    # the log can be bigger than the cache, so remember digests, not queries
+    return hashlib.blake2b(query, digest_size=16).digest()
+
+  def _store(self, query: bytes, result: bytes):
+    self._entries.put(query, result, len(query) + len(result))
+
+  def __call__(self, query) -> bytes:
+    query = bytes(query)
+    result = self._entries.get(query)
+    if result is not None:
+      return result
+    result = self.oracle(query)
+    self._store(query, bytes(result))
+    if self._log is not None:
+      self._append(query, result)
+    return result
+
+  def _append(self, query: bytes, result: bytes):
+    digest = self._digest(query)
+    if digest in self._logged:
+      return
+    self._logged.add(digest)
+    self._log.write(self._header.pack(len(query), len(result)))
+    self._log.write(query)
+    self._log.write(result)
+    self._log.flush()
+
+  def close(self):
+    if self._log is not None:
+      self._log.close()
+      self._log = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def stats(self) -> dict:
+    return self._entries.stats()
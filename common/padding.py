@@ -0,0 +1,61 @@
+# PKCS#7 padding, shared by everything that pads / unpads
+# - the check is on the hot path of the padding oracle attack (the oracle
+#   checks the padding on every single query), so is_valid_padding doesn't
+#   copy the data or build anything to compare against, the pad runs are
+#   made once up front
+BLOCK_SIZE = 16
+
+# _PADS[n] == bytes([n] * n)
+_PADS = [bytes([n] * n) for n in range(256)]
+
+
+def pad(data, block_size: int = BLOCK_SIZE) -> bytes:
+  # always adds at least one byte (a whole block if already aligned)
+  pad_bytes = block_size - len(data) % block_size
+  return bytes(data) + _PADS[pad_bytes]
+
+
+def padding_len(data, block_size: int = BLOCK_SIZE) -> int:
+  """ Number of padding bytes at the end of data, or 0 if it's not valid
+
+  data can be bytes, bytearray or a memoryview of bytes.
+  """
+  n = len(data)
+  if not n or n % block_size:
+    return 0
+  pad_bytes = data[-1]
+  if pad_bytes > block_size or not pad_bytes:
+    return 0
+  if type(data) is memoryview:
+    # compares the slice in place, no copy
+    ok = data[n - pad_bytes:] == _PADS[pad_bytes]
+  else:
+    ok = data.endswith(_PADS[pad_bytes])
+  return pad_bytes if ok else 0
+
+
+def is_valid_padding(data, block_size: int = BLOCK_SIZE) -> bool:
+  return padding_len(data, block_size) != 0
+
+
+def unpad(data, block_size: int = BLOCK_SIZE) -> memoryview | None:
+  """ Remove PKCS#7 padding - returns None if the padding is invalid
+
+  Returns a view of data without the padding, rather than a copy. It
+  doesn't raise for bad padding, raising and catching costs more than the
+  check itself, and most of what a padding oracle sees is bad padding.
+  """
+  pad_bytes = padding_len(data, block_size)
+  if not pad_bytes:
+    return None
+  if type(data) is not memoryview:
+    data = memoryview(data)
+  return data[:len(data) - pad_bytes]
+
+
+def remove_padding(text: bytes, block_size: int = BLOCK_SIZE) -> bytes:
+  """ Remove padding from bytes - raise ValueError if padding is invalid """
+  view = unpad(text, block_size)
+  if view is None:
+    raise ValueError("Invalid padding")
+  return bytes(view)
@@ -0,0 +1,461 @@
+# CBC padding oracle attack (set 3, challenge 17), plus an asyncio version
+# for oracles on the other end of a network connection
+# - single_block_attack / crack_cbc are the original, one query at a time
+# - the async versions send all 256 candidates for a byte at once (up to a
+#   limit on queries in flight) and attack every block at the same time, so
+#   the attack takes about as many round trips as there are bytes in a block
+#   instead of as many queries as it makes
+# - with a plaintext "order" (most likely bytes first) the candidates for
+#   each byte are tried in that order rather than 0..255, which for text
+#   cuts the ~128 queries per byte down to a handful - for the async version
+#   only if the limit is well below 256, with all 256 candidates in flight
+#   together the order makes no difference to how many get sent
+# - crack_cbc_parallel farms the blocks out to a process pool instead, and
+#   checkpoints each block as it's done so a long attack can be resumed
+# - serve_padding_oracle / PaddingOracleClient are a local stand-in for a
+#   remote oracle: python -m common.padding_oracle --delay 0.05
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from common.cbc import decrypt_cbc, encrypt_cbc
+from common.padding import is_valid_padding, pad, remove_padding
+from common.utils import LETTER_FREQ
+from common.xor import xor_bytes
+
+BLOCK_SIZE = 16
+
+
+def byte_order(*alphabets) -> bytes:
+  """ All 256 byte values, the ones in alphabets first (in that order) """
+  seen = dict.fromkeys(b for alphabet in alphabets for b in alphabet)
+  return bytes(seen) + bytes(b for b in range(256) if b not in seen)
+
+
+# most likely plaintext bytes first, for single_block_attack(order=...)
+PAD_ORDER = bytes(range(1, BLOCK_SIZE + 1))
+_LETTERS = "".join(sorted(LETTER_FREQ, key=LETTER_FREQ.get, reverse=True))
+ENGLISH_ORDER = byte_order(
+  _LETTERS.encode(), _LETTERS.upper().encode(), b".,-!?;:\n",
+  string.digits.encode(), string.printable.encode())
+BASE64_ORDER = byte_order(
+  (string.ascii_letters + string.digits + "+/=").encode())
+
+
+def candidate_order(prev_byte: int, pad_val: int, order: bytes) -> list:
+  # the oracle says yes when candidate ^ DEC(block)[i] == pad_val, and the
+  # plaintext byte is DEC(block)[i] ^ prev_byte, so guessing plaintext p
+  # means trying candidate p ^ prev_byte ^ pad_val
+  k = prev_byte ^ pad_val
+  return [p ^ k for p in order]
+
+
+def _candidates(prev, order, zeroing_iv: list, pad_val: int):
+  if order is None:
+    return range(256)
+  idx = len(zeroing_iv) - pad_val
+  if pad_val > 1:
+    # runs of the same byte are common (padding, spaces, ...), so try the
+    # plaintext byte we just found first
+    last = zeroing_iv[idx + 1] ^ prev[idx + 1]
+    order = byte_order(bytes([last]), order)
+  return candidate_order(prev[idx], pad_val, order)
+
+
+def block_orders(n_blocks: int, order: bytes) -> list:
+  # the last block ends in padding, so try pad values first there
+  if order is None:
+    return [None] * n_blocks
+  return [order] * (n_blocks - 1) + [byte_order(PAD_ORDER, order)]
+
+
+def single_block_attack(block, oracle, prev: bytes = None, order: bytes = None):
+  """Returns the decryption of the given ciphertext block.
+
+  This is from:
+  https://research.nccgroup.com/2021/02/17/cryptopals-exploiting-cbc-padding-oracles/
+  Because I got stuck on this one... it actually turned out that
+  I was not doing anything wrong in this part, but function to remove padding
+  and raise if was not valid was wrong.
+
+  Candidates are tried 0..255, unless order (all 256 plaintext byte values,
+  most likely first, eg ENGLISH_ORDER) and the previous ciphertext block
+  prev are given - then they're tried most likely plaintext first.
+  """
+  if order is not None and prev is None:
+    raise ValueError("order needs the previous block")
+
+  # zeroing_iv starts out nulled. each iteration of the main loop will add
+  # one byte to it, working from right to left, until it is fully populated,
+  # at which point it contains the result of DEC(ct_block)
+  block_size = len(block)
+  zeroing_iv = [0] * block_size
+  for pad_val in range(1, block_size+1):
+    padding_iv = [pad_val ^ b for b in zeroing_iv]
+    for candidate in _candidates(prev, order, zeroing_iv, pad_val):
+      padding_iv[-pad_val] = candidate
+      iv = bytes(padding_iv)
+      if oracle(block, iv):
+        if pad_val == 1:
+          # make sure the padding really is of length 1 by changing
+          # the penultimate block and querying the oracle again
+          padding_iv[-2] ^= 1
+          iv = bytes(padding_iv)
+          if not oracle(block, iv):
+            continue  # false positive; keep searching
+        break
+    else:
+      raise Exception("no valid padding byte found")
+    zeroing_iv[-pad_val] = candidate ^ pad_val
+  return zeroing_iv
+
+
+def split_blocks(iv: bytes, ciphertext: bytes, block_size: int = BLOCK_SIZE):
+  ct = iv + ciphertext
+  return [ct[i:i + block_size] for i in range(0, len(ct), block_size)]
+
+
+def crack_cbc(iv: bytes, ciphertext: bytes, padding_oracle: callable,
+              order: bytes = None):
+  """ Crack CBC using padding oracle (order: see single_block_attack) """
+  # all the oracle will do is check if the padding is valid or not
+  # we have to find a way to use this to decrypt the ciphertext...
+  blocks = split_blocks(iv, ciphertext)
+  orders = block_orders(len(blocks) - 1, order)
+  plaintext = b"" # we will build the plaintext here
+  for prev, block, block_order in zip(blocks, blocks[1:], orders):
+    dec = single_block_attack(block, padding_oracle, prev, block_order)
+    plaintext += xor_bytes(prev, bytes(dec))
+  return plaintext
+
+
+class LocalPaddingOracle:
+  """ The challenge 17 oracle as a class, so it can be sent to other
+  processes (closures can't be pickled) """
+
+  def __init__(self, key: bytes, block_size: int = BLOCK_SIZE):
+    self.key = key
+    self.block_size = block_size
+
+  def __call__(self, ciphertext: bytes, iv: bytes) -> bool:
+    return is_valid_padding(
+      decrypt_cbc(ciphertext, self.key, iv), self.block_size)
+
+
+def _attack_block(job: tuple) -> tuple:
+  index, prev, block, oracle, order = job
+  return index, single_block_attack(block, oracle, prev, order)
+
+
+def load_checkpoint(path: str, digest: str) -> dict:
+  """ {block index: zeroing_iv} saved so far for the ciphertext digest """
+  try:
+    with open(path) as f:
+      checkpoint = json.load(f)
+  except FileNotFoundError:
+    return {}
+  if checkpoint["ciphertext"] != digest:
+    raise ValueError(f"{path} is a checkpoint for a different ciphertext")
+  return {int(k): list(bytes.fromhex(v))
+          for k, v in checkpoint["blocks"].items()}
+
+
+def save_checkpoint(path: str, digest: str, done: dict):
+  # write the whole thing to a temp file and swap it in, so a crash can
+  # never leave a half written checkpoint behind
+  tmp = f"{path}.tmp"
+  with open(tmp, "w") as f:
+    json.dump({"ciphertext": digest,
+               "blocks": {str(k): bytes(v).hex() for k, v in done.items()}},
+              f)
+  os.replace(tmp, path)
+
+
+def crack_cbc_parallel(
+    iv: bytes, ciphertext: bytes, padding_oracle: callable,
+    workers: int = None, checkpoint: str = None,
+    order: bytes = None) -> bytes:
+  """ crack_cbc with the blocks spread over a pool of worker processes.
+
+  padding_oracle has to be picklable (eg LocalPaddingOracle). With
+  checkpoint set, each block's result is saved there as soon as it's found,
+  and blocks already in the file are skipped - so rerunning after a crash
+  picks up where it left off.
+  """
+  blocks = split_blocks(iv, ciphertext)
+  digest = hashlib.sha256(iv + ciphertext).hexdigest()
+  done = load_checkpoint(checkpoint, digest) if checkpoint else {}
+
+  def finished(index: int, zeroing_iv: list):
+    done[index] = zeroing_iv
+    if checkpoint:
+      save_checkpoint(checkpoint, digest, done)
+
+  orders = block_orders(len(blocks) - 1, order)
+  jobs = [(i, blocks[i], blocks[i + 1], padding_oracle, orders[i])
+          for i in range(len(blocks) - 1) if i not in done]
+  if workers is not None and workers > 1:
+    with ProcessPoolExecutor(workers) as executor:
+      for future in as_completed(
+          [executor.submit(_attack_block, job) for job in jobs]):
+        finished(*future.result())
+  else:
+    for job in jobs:
+      finished(*_attack_block(job))
+
+  return b"".join([xor_bytes(blocks[i], bytes(done[i]))
+                   for i in range(len(blocks) - 1)])
+
+
+def as_async(oracle: callable) -> callable:
+  """ Wrap a plain oracle(block, iv) -> bool so it can be awaited """
+  async def async_oracle(block: bytes, iv: bytes) -> bool:
+    return oracle(block, iv)
+  return async_oracle
+
+
+async def single_block_attack_async(
+    block: bytes, oracle: callable, limit: asyncio.Semaphore = None,
+    prev: bytes = None, order: bytes = None) -> list:
+  """ Same as single_block_attack, for an async oracle(block, iv).
+
+  All 256 candidates for each byte are sent together, and whatever's still
+  pending is cancelled as soon as one of them comes back valid. limit is
+  shared with anything else querying the oracle, to cap queries in flight,
+  and with an order the most likely candidates are first in line for it.
+  """
+  if order is not None and prev is None:
+    raise ValueError("order needs the previous block")
+  limit = limit or asyncio.Semaphore(256)
+
+  async def query(iv: list) -> bool:
+    async with limit:
+      return await oracle(block, bytes(iv))
+
+  async def probe(padding_iv: list, pad_val: int, candidate: int):
+    padding_iv = padding_iv.copy()
+    padding_iv[-pad_val] = candidate
+    if not await query(padding_iv):
+      return None
+    if pad_val == 1:
+      # make sure the padding really is of length 1, see above
+      padding_iv[-2] ^= 1
+      if not await query(padding_iv):
+        return None
+    return candidate
+
+  block_size = len(block)
+  zeroing_iv = [0] * block_size
+  for pad_val in range(1, block_size + 1):
+    padding_iv = [pad_val ^ b for b in zeroing_iv]
+    tasks = [asyncio.create_task(probe(padding_iv, pad_val, candidate))
+             for candidate in _candidates(prev, order, zeroing_iv, pad_val)]
+    try:
+      for next_done in asyncio.as_completed(tasks):
+        if (candidate := await next_done) is not None:
+          break
+      else:
+        raise Exception("no valid padding byte found")
+    finally:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+    zeroing_iv[-pad_val] = candidate ^ pad_val
+  return zeroing_iv
+
+
+async def crack_cbc_async(
+    iv: bytes, ciphertext: bytes, padding_oracle: callable,
+    limit: int = 256, order: bytes = None) -> bytes:
+  """ crack_cbc with an async oracle, attacking all blocks concurrently.
+
+  No more than limit queries are in flight at once, across all blocks. An
+  order only cuts the number of queries when limit is well below 256.
+  """
+  semaphore = asyncio.Semaphore(limit)
+  blocks = split_blocks(iv, ciphertext)
+  orders = block_orders(len(blocks) - 1, order)
+  decrypted = await asyncio.gather(*[
+    single_block_attack_async(block, padding_oracle, semaphore, prev, o)
+    for prev, block, o in zip(blocks, blocks[1:], orders)])
+  return b"".join([xor_bytes(prev, bytes(dec))
+                   for prev, dec in zip(blocks, decrypted)])
+
+
+# A stand-in padding oracle server. Requests are one line of hex (iv then
+# ciphertext), the reply is a line with 1 for good padding, 0 for bad.
+
+async def serve_padding_oracle(
+    oracle: callable, host: str = "127.0.0.1", port: int = 0,
+    delay: float = 0.0) -> asyncio.AbstractServer:
+  """ Serve the plain oracle(ciphertext, iv) -> bool over TCP.
+
+  delay is added to every reply, to act like a remote service. Returns the
+  (started) server, server.sockets[0].getsockname() has the port.
+  """
+  async def handle(reader, writer):
+    try:
+      while line := await reader.readline():
+        data = bytes.fromhex(line.decode())
+        ok = oracle(data[BLOCK_SIZE:], data[:BLOCK_SIZE])
+        if delay:
+          await asyncio.sleep(delay)
+        writer.write(b"1\n" if ok else b"0\n")
+        await writer.drain()
+    except (ConnectionError, ValueError):
+      pass
+    finally:
+      writer.close()
+  return await asyncio.start_server(handle, host, port)
+
+
+class PaddingOracleClient:
+  """ Async oracle(block, iv) -> bool that asks a serve_padding_oracle.
+
+  Keeps a pool of connections open, each one has one query at a time in
+  flight, so connections is the most queries that can be in flight. A
+  connection that fails or that the server closes is replaced with a new
+  one, so the pool stays full. A query the server hung up on is asked once
+  more on a new connection, after that it raises ConnectionError.
+
+    async with PaddingOracleClient(host, port) as oracle:
+      plaintext = await crack_cbc_async(iv, ciphertext, oracle)
+  """
+
+  def __init__(self, host: str, port: int, connections: int = 64):
+    self.host = host
+    self.port = port
+    self.connections = connections
+    self.queries = 0
+    self._pool = None
+    self._tasks = set() # replies being drained, connections being replaced
+
+  async def __aenter__(self):
+    self._pool = asyncio.Queue()
+    for _ in range(self.connections):
+      self._pool.put_nowait(await self._connect())
+    return self
+
+  async def __aexit__(self, *exc):
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    while not self._pool.empty():
+      _, writer = self._pool.get_nowait()
+      writer.close()
+      await writer.wait_closed()
+
+  async def __call__(self, block: bytes, iv: bytes) -> bool:
+    try:
+      return await self._query(block, iv)
+    except ConnectionError:
+      # eg a server that closes connections after so many queries
+      return await self._query(block, iv)
+
+  async def _query(self, block: bytes, iv: bytes) -> bool:
+    reader, writer = await self._pool.get()
+    try:
+      writer.write((iv + block).hex().encode() + b"\n")
+      await writer.drain()
+      reply = await reader.readline()
+      if not reply:
+        # EOF is the server closing the connection, not an answer
+        raise ConnectionError("padding oracle server closed the connection")
+    except asyncio.CancelledError:
+      # the reply is still coming, read it (in the background) before the
+      # connection goes back in the pool, or the next query would get it
+      self._spawn(self._drain(reader, writer))
+      raise
+    except ConnectionError:
+      # shielded, so being cancelled meanwhile doesn't lose the connection
+      await asyncio.shield(self._spawn(self._replace(writer)))
+      raise
+    except BaseException:
+      self._spawn(self._replace(writer))
+      raise
+    self._pool.put_nowait((reader, writer))
+    self.queries += 1
+    return reply == b"1\n"
+
+  def _spawn(self, coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return task
+
+  async def _connect(self):
+    return await asyncio.open_connection(self.host, self.port)
+
+  async def _replace(self, writer):
+    writer.close()
+    self._pool.put_nowait(await self._connect())
+
+  async def _drain(self, reader, writer):
+    try:
+      reply = await reader.readline()
+    except ConnectionError:
+      reply = b""
+    if not reply:
+      await self._replace(writer)
+      return
+    self.queries += 1
+    self._pool.put_nowait((reader, writer))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Padding oracle attack against a local stand-in oracle")
+  parser.add_argument("--delay", type=float, default=0.05,
+                      help="seconds the server takes to answer each query")
+  parser.add_argument("--limit", type=int, default=None,
+                      help="most queries in flight at once (default 256, or "
+                           "32 with an --order other than numeric)")
+  parser.add_argument("--message", default="Now that the party is jumping")
+  parser.add_argument("--key", type=bytes.fromhex, default=None,
+                      help="hex, random if not given")
+  parser.add_argument("--iv", type=bytes.fromhex, default=None,
+                      help="hex, random if not given")
+  parser.add_argument("--order", choices=["numeric", "english", "base64"],
+                      default="english", help="order to try candidates in")
+  parser.add_argument("--workers", type=int, default=None,
+                      help="use a process pool instead of the server")
+  parser.add_argument("--checkpoint", default=None,
+                      help="save progress here and resume from it (use with "
+                           "a fixed --key and --iv)")
+  args = parser.parse_args()
+
+  key = args.key or os.urandom(BLOCK_SIZE)
+  iv = args.iv or os.urandom(BLOCK_SIZE)
+  ciphertext = encrypt_cbc(
+    pad(args.message.encode(), BLOCK_SIZE), key, iv)
+  oracle = LocalPaddingOracle(key)
+  order = {"numeric": None, "english": ENGLISH_ORDER,
+           "base64": BASE64_ORDER}[args.order]
+  # the order only saves queries if most candidates wait their turn
+  limit = args.limit or (256 if order is None else 32)
+
+  async def attack():
+    server = await serve_padding_oracle(oracle, delay=args.delay)
+    host, port = server.sockets[0].getsockname()[:2]
+    async with server:
+      async with PaddingOracleClient(host, port, limit) as client:
+        plaintext = await crack_cbc_async(
+          iv, ciphertext, client, limit, order)
+    print(f"{client.queries} queries")
+    return plaintext
+
+  start = time.perf_counter()
+  if args.workers or args.checkpoint:
+    plaintext = crack_cbc_parallel(
+      iv, ciphertext, oracle, args.workers, args.checkpoint, order)
+  else:
+    plaintext = asyncio.run(attack())
+  print(f"Recovered: {remove_padding(plaintext, BLOCK_SIZE)}")
+  print(f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,136 @@
+# Different ways of scoring candidate plaintexts (higher is better), which
+# can be plugged into common.utils.best_score / crack_rkey_xor.
+#
+# Every scorer can score a single buffer (score) or all 256 single-byte XOR
+# keys of a buffer from its histogram (key_scores). With max_nonprintable
+# set, anything with more than that fraction of non-printable bytes is
+# rejected (scores REJECT) before doing the real work, which on noisy input
+# is most candidates.
+import math
+from collections import Counter
+
+from common.frequency import FrequencyModel
+from common.utils import ENGLISH
+
+REJECT = float("-inf")
+PRINTABLE = bytes(range(32, 127)) + b"\t\n\r"
+_IS_PRINTABLE = [b in PRINTABLE for b in range(256)]
+_LOWER = bytes(range(256)).lower()
+
+
+class Scorer:
+  """ Base class - subclasses implement _score(counts, n).
+
+  counts is a list of (byte value, count) pairs for a candidate plaintext
+  and n its length.
+  """
+
+  def __init__(self, max_nonprintable: float = None):
+    self.max_nonprintable = max_nonprintable
+
+  def _score(self, counts: list, n: int) -> float:
+    raise NotImplementedError
+
+  def _too_many(self, nonprintable: int, n: int) -> bool:
+    return (self.max_nonprintable is not None and
+            nonprintable > self.max_nonprintable * n)
+
+  def score(self, bstr) -> float:
+    n = len(bstr)
+    if self.max_nonprintable is not None:
+      # translate deletes the printable bytes in C, what's left is the rest
+      if self._too_many(len(bytes(bstr).translate(None, PRINTABLE)), n):
+        return REJECT
+    return self._score(list(Counter(bstr).items()), n)
+
+  def key_scores(self, bstr) -> list:
+    """ score(xor(bstr, key)) for every single byte key """
+    n = len(bstr)
+    counts = list(Counter(bstr).items())
+    limit = None
+    if self.max_nonprintable is not None:
+      limit = self.max_nonprintable * n
+      # most common bytes first, so a bad key goes over the limit sooner
+      by_count = sorted(counts, key=lambda x: x[1], reverse=True)
+    scores = []
+    for key in range(256):
+      if limit is not None:
+        # stop counting as soon as it's over the limit
+        nonprintable = 0
+        for b, c in by_count:
+          if not _IS_PRINTABLE[b ^ key]:
+            nonprintable += c
+            if nonprintable > limit:
+              break
+        if nonprintable > limit:
+          scores.append(REJECT)
+          continue
+      scores.append(self._score([(b ^ key, c) for b, c in counts], n))
+    return scores
+
+
+class FrequencyScorer(Scorer):
+  """ Sum of letter frequencies - the original common.utils.score """
+
+  def __init__(self, model: FrequencyModel = ENGLISH, **kwargs):
+    super().__init__(**kwargs)
+    self.model = model
+
+  def _score(self, counts, n):
+    weights = self.model.weights
+    return sum([weights[b] * c for b, c in counts])
+
+
+class ChiSquaredScorer(Scorer):
+  """ Negative chi-squared distance from the model's letter distribution.
+
+  Bytes are case folded, and everything the model gives no weight to shares
+  one "other" bucket, which is expected to be other_frequency of the text.
+  """
+
+  def __init__(self, model: FrequencyModel = ENGLISH,
+               other_frequency: float = 0.01, **kwargs):
+    super().__init__(**kwargs)
+    folded = {_LOWER[b]: w for b, w in enumerate(model.weights) if w > 0}
+    total = sum(folded.values())
+    self.expected = {b: (1 - other_frequency) * w / total
+                     for b, w in folded.items()}
+    self.other_frequency = other_frequency
+
+  def _score(self, counts, n):
+    if n == 0:
+      return 0.0
+    observed = Counter()
+    for b, c in counts:
+      b = _LOWER[b]
+      observed[b if b in self.expected else None] += c
+    chi2 = 0.0
+    for b, p in self.expected.items():
+      chi2 += (observed[b] - n * p) ** 2 / (n * p)
+    other = n * self.other_frequency
+    chi2 += (observed[None] - other) ** 2 / other
+    return -chi2
+
+
+class LogLikelihoodScorer(Scorer):
+  """ Log10 probability of the bytes under the model's letter distribution """
+
+  def __init__(self, model: FrequencyModel = ENGLISH,
+               floor: float = 1e-4, **kwargs):
+    super().__init__(**kwargs)
+    total = sum(model.weights) or 1
+    self.log_probs = [math.log10(max(w / total, floor))
+                      for w in model.weights]
+
+  def _score(self, counts, n):
+    log_probs = self.log_probs
+    return sum([log_probs[b] * c for b, c in counts])
+
+
+class PrintableScorer(Scorer):
+  """ Fraction of the bytes that are printable ASCII """
+
+  def _score(self, counts, n):
+    if n == 0:
+      return 0.0
+    return sum([c for b, c in counts if _IS_PRINTABLE[b]]) / n
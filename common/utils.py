@@ -1,15 +1,19 @@
-from Crypto.Cipher import AES
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 
-def xor(bstr: bytes, key: int):
-  return bytes([b ^ key for b in bstr])
+from Crypto.Cipher import AES
 
-def repeating_xor(bstr: bytes, key: bytes):
-  return bytes([b ^ key[i % len(key)]
-                for i, b in enumerate(bstr)])
+from common.frequency import FrequencyModel, as_model
+from common.xor import repeating_xor, xor
 
 def hamming_distance(bstr1: bytes, bstr2: bytes):
-  return sum([bin(b1 ^ b2).count("1")
-              for (b1, b2) in zip(bstr1, bstr2)])
+  # xor the buffers as two big ints and count the set bits of the result,
+  # only comparing up to the length of the shorter one (like zip did)
+  n = min(len(bstr1), len(bstr2))
+  i1 = int.from_bytes(memoryview(bstr1)[:n], "little")
+  i2 = int.from_bytes(memoryview(bstr2)[:n], "little")
+  return (i1 ^ i2).bit_count()
 
 def encrypt_ecb(plaintext, key):
   return AES.new(key, AES.MODE_ECB).encrypt(plaintext)
@@ -19,98 +23,155 @@ def decrypt_ecb(cipher, key):
   return AES.new(key, AES.MODE_ECB).decrypt(cipher)
 
 
+# https://en.wikipedia.org/wiki/Letter_frequency
+LETTER_FREQ = {
+    'a': 0.08167,
+    'b': 0.01492,
+    'c': 0.02782,
+    'd': 0.04253,
+    'e': 0.12702,
+    'f': 0.02228,
+    'g': 0.02015,
+    'h': 0.06094,
+    'i': 0.06966,
+    'j': 0.00153,
+    'k': 0.00772,
+    'l': 0.04025,
+    'm': 0.02406,
+    'n': 0.06749,
+    'o': 0.07507,
+    'p': 0.01929,
+    'q': 0.00095,
+    'r': 0.05987,
+    's': 0.06327,
+    't': 0.09056,
+    'u': 0.02758,
+    'v': 0.00978,
+    'w': 0.02360,
+    'x': 0.00150,
+    'y': 0.01974,
+    'z': 0.00074,
+    ' ': 0.13000,
+    '/': 0.02,
+    '"': 0.02,
+    "'": 0.02,
+}
+
+
+ENGLISH = FrequencyModel.from_map(LETTER_FREQ)
+
+
 def score(bstr: bytes, frequency_map=None):
-  # https://en.wikipedia.org/wiki/Letter_frequency
-  freq = {
-      'a': 0.08167,
-      'b': 0.01492,
-      'c': 0.02782,
-      'd': 0.04253,
-      'e': 0.12702,
-      'f': 0.02228,
-      'g': 0.02015,
-      'h': 0.06094,
-      'i': 0.06966,
-      'j': 0.00153,
-      'k': 0.00772,
-      'l': 0.04025,
-      'm': 0.02406,
-      'n': 0.06749,
-      'o': 0.07507,
-      'p': 0.01929,
-      'q': 0.00095,
-      'r': 0.05987,
-      's': 0.06327,
-      't': 0.09056,
-      'u': 0.02758,
-      'v': 0.00978,
-      'w': 0.02360,
-      'x': 0.00150,
-      'y': 0.01974,
-      'z': 0.00074,
-      ' ': 0.13000,
-      '/': 0.02,
-      '"': 0.02,
-      "'": 0.02,
-  } if frequency_map is None else frequency_map
-  return sum([freq.get(chr(b), 0) for b in bstr.lower()])
-
-
-def best_score(bstr: bytes, top_n: int = 1, frequency_map=None):
+  # frequency_map can be a {char: frequency} dict or a FrequencyModel
+  return as_model(frequency_map, ENGLISH).score(bstr)
+
+
+def key_scores(bstr: bytes, frequency_map=None) -> list:
+  """ score(xor(bstr, key)) for every single byte key, without xor'ing """
+  return as_model(frequency_map, ENGLISH).key_scores(bstr)
+
+
+def best_score(bstr: bytes, top_n: int = 1, frequency_map=None, scorer=None):
   # Returns [(key, score, result), ...]
-  results = [(i, score(xor(bstr, i)), xor(bstr,i)) for i in range(0, 256)]
-  results.sort(reverse=True, key=lambda x: x[1])
-  return results[:top_n]
+  # scorer is one of the common.scoring scorers, the default is score()
+  if scorer is None:
+    scores = key_scores(bstr, frequency_map)
+  else:
+    scores = scorer.key_scores(bstr)
+  # stable sort, so exact ties keep the lowest key first. Scores are summed
+  # from the histogram, not byte by byte like the old version, so they can
+  # differ in the last bits and near ties may come out in another order.
+  keys = sorted(range(256), reverse=True, key=lambda k: scores[k])
+  # only build the plaintext for the results we actually return
+  return [(k, scores[k], xor(bstr, k)) for k in keys[:top_n]]
 
 
 def best_key_sizes(
     min_key_size: int, max_key_size: int, bstr: bytes,
-    top_n: int = 1):
-  # Returns key size, distance
+    top_n: int = 1, sample_pairs: int = None):
+  """ Returns [(key size, distance), ...] for the top_n key sizes.
+
+  distance is the hamming distance between each block and the next, per
+  byte, averaged over the blocks. With sample_pairs only that many pairs of
+  blocks (spread evenly over bstr) are compared for each key size, which is
+  much faster on big inputs.
+  """
+  if sample_pairs is not None and sample_pairs < 1:
+    raise ValueError("sample_pairs must be at least 1")
+  view = memoryview(bstr)
+  whole = None # bstr as one big int, only built if we need it
   key_dist = []
   for key_size in range(min_key_size, max_key_size + 1):
-    scores = []
-    if len(bstr) < 2 * key_size:
+    num_blocks = len(bstr) // key_size
+    if num_blocks < 2:
       break
-    for i in range(0, len(bstr) // key_size - 1):
-      # compare the ith and (i+1)th blocks
-      b1 = bstr[i*key_size:(i+1)*key_size]
-      b2 = bstr[(i+1)*key_size:(i+2)*key_size]
-      score = hamming_distance(b1, b2) / key_size
-      scores.append(score)
-    key_dist.append((key_size, sum(scores) / len(scores)))
+    num_pairs = num_blocks - 1
+    if sample_pairs is None or sample_pairs >= num_pairs:
+      # comparing the ith and (i+1)th blocks for every i is the same as
+      # xor'ing bstr with itself shifted by one block. That also counts the
+      # bits of the last (partial) block and the key_size bytes shifted in
+      # against zeros, so take those back off.
+      if whole is None:
+        whole = int.from_bytes(view, "little")
+      end = num_pairs * key_size
+      tail = hamming_distance(view[end:-key_size], view[end + key_size:])
+      tail += int.from_bytes(view[-key_size:], "little").bit_count()
+      bits = (whole ^ (whole >> (8 * key_size))).bit_count() - tail
+    else:
+      step = num_pairs / sample_pairs
+      starts = [int(i * step) * key_size for i in range(sample_pairs)]
+      b1 = b"".join([view[s:s + key_size] for s in starts])
+      b2 = b"".join([view[s + key_size:s + 2 * key_size] for s in starts])
+      bits = hamming_distance(b1, b2)
+      num_pairs = sample_pairs
+    key_dist.append((key_size, bits / key_size / num_pairs))
   key_dist.sort(key=lambda x: x[1])
   return key_dist[:top_n]
 
 
+def best_key_byte(bstr: bytes, frequency_map=None, scorer=None) -> int:
+  # top level (rather than a lambda) so it can be sent to worker processes
+  return best_score(bstr, 1, frequency_map, scorer)[0][0]
+
+
 # This is from set 1 challenge 6, putting in common to support other challenges
 def crack_rkey_xor(
     bstr: bytes,
     min_key_size: int,
     max_key_size: int,
     top_n: int = 3,
-    frequency_map = None):
+    frequency_map = None,
+    workers: int = None,
+    sample_pairs: int = None,
+    scorer = None):
   """ Crack repeating key XOR using hamming distance and letter frequency
 
-  Try key sizes from min_key_size to max_key_size, and return the top_n results
-  ."""
+  Try key sizes from min_key_size to max_key_size, and return the top_n results.
+  Each byte of each candidate key is an independent single-byte XOR problem,
+  so with workers > 1 they are spread over a process pool.
+  """
   candidates = best_key_sizes(
-    min_key_size, max_key_size, bstr, top_n)
+    min_key_size, max_key_size, bstr, top_n, sample_pairs)
+  # the ith byte of the key is xor'd with the ith byte of each block, so take
+  # the ith byte of every block (bstr[i::key_size]) and score it just once
+  columns = [bstr[i::key_size]
+             for key_size, _ in candidates for i in range(key_size)]
+  find_byte = partial(
+    best_key_byte, frequency_map=frequency_map, scorer=scorer)
+  if workers is not None and workers > 1:
+    with ProcessPoolExecutor(workers) as executor:
+      # map() gives results back in the order submitted, so this is
+      # deterministic no matter which worker finishes first
+      key_bytes = list(executor.map(
+        find_byte, columns, chunksize=max(1, len(columns) // (4 * workers))))
+  else:
+    key_bytes = [find_byte(column) for column in columns]
+
   res = []
+  key_bytes = iter(key_bytes)
   for key_size, _ in candidates:
-    # take the first byte of each block, then the second byte, etc.
-    key = []
-    for i in range(key_size): # get the ith byte of key
-      best_key = None 
-      best_s = 0
-      for bidx in range(0, len(bstr) // key_size):
-        end = min(bidx * key_size + i + key_size, len(bstr))
-        block = bstr[end::key_size]
-        k, s, _ = best_score(block)[0]
-        if best_key is None or s >= best_s:
-          best_key = k
-          best_s = s
-      key.append(best_key)
-    txt = repeating_xor(bstr, bytes(key))
-    res.append((score(txt), bytes(key), txt))
+    key = bytes(islice(key_bytes, key_size))
+    txt = repeating_xor(bstr, key)
+    total = score(txt, frequency_map) if scorer is None else scorer.score(txt)
+    res.append((total, key, txt))
   return sorted(res, reverse=True, key=lambda x: x[0]),
\ No newline at end of file
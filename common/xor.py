@@ -0,0 +1,57 @@
+# XOR helpers used by pretty much every challenge. They work on the whole
+# buffer at once (as one big int, or with bytes.translate) rather than a byte
+# at a time, and take bytes, bytearray or memoryview without copying them.
+
+# _XOR_TABLES[key][b] == b ^ key, for bytes.translate
+_XOR_TABLES = [bytes([b ^ key for b in range(256)]) for key in range(256)]
+
+
+def _view(bstr):
+  # bytes-like object where len() is in bytes (eg not a memoryview of ints)
+  if isinstance(bstr, (bytes, bytearray)):
+    return bstr
+  return memoryview(bstr).cast("B")
+
+
+def _store(value: int, n: int, out=None):
+  result = value.to_bytes(n, "little")
+  if out is None:
+    return result
+  # write into the caller's buffer (bytearray or writable memoryview)
+  memoryview(out).cast("B")[:n] = result
+  return out
+
+
+def xor(bstr: bytes, key: int) -> bytes:
+  """ XOR every byte of bstr with the single byte key """
+  if not isinstance(bstr, (bytes, bytearray)):
+    bstr = bytes(bstr)
+  return bytes(bstr.translate(_XOR_TABLES[key]))
+
+
+def xor_bytes(bstr1: bytes, bstr2: bytes, out=None):
+  """ XOR two buffers together, up to the length of the shorter one.
+
+  If out is given (a bytearray or writable memoryview) the result is written
+  into the start of it and out is returned, otherwise new bytes are returned.
+  """
+  v1, v2 = _view(bstr1), _view(bstr2)
+  n = min(len(v1), len(v2))
+  # trim the longer one with a view, not a copy
+  if len(v1) > n:
+    v1 = memoryview(v1)[:n]
+  if len(v2) > n:
+    v2 = memoryview(v2)[:n]
+  value = int.from_bytes(v1, "little") ^ int.from_bytes(v2, "little")
+  return _store(value, n, out)
+
+
+def repeating_xor(bstr: bytes, key: bytes, out=None):
+  """ XOR bstr with key repeated to the length of bstr (see xor_bytes) """
+  view = _view(bstr)
+  if not isinstance(key, (bytes, bytearray)):
+    key = bytes(key) # keys are short, copying is fine
+  if len(key) != len(view):
+    reps, rem = divmod(len(view), len(key))
+    key = key * reps + key[:rem]
+  return xor_bytes(view, key, out)
@@ -1,59 +1,79 @@
 # Cryptopals Set 1, Challenge 4 - Detect / break single-character XOR
-def xor(bstr: bytes, key: int):
-  return bytes([b ^ key for b in bstr])
-
-def score(bstr: bytes):
-  # https://en.wikipedia.org/wiki/Letter_frequency
-  freq = {
-      'a': 0.08167,
-      'b': 0.01492,
-      'c': 0.02782,
-      'd': 0.04253,
-      'e': 0.12702,
-      'f': 0.02228,
-      'g': 0.02015,
-      'h': 0.06094,
-      'i': 0.06966,
-      'j': 0.00153,
-      'k': 0.00772,
-      'l': 0.04025,
-      'm': 0.02406,
-      'n': 0.06749,
-      'o': 0.07507,
-      'p': 0.01929,
-      'q': 0.00095,
-      'r': 0.05987,
-      's': 0.06327,
-      't': 0.09056,
-      'u': 0.02758,
-      'v': 0.00978,
-      'w': 0.02360,
-      'x': 0.00150,
-      'y': 0.01974,
-      'z': 0.00074,
-      ' ': 0.13000,
-  }
-  return sum([freq.get(chr(b), 0) for b in bstr.lower()])
-  
-def best_score(bstr: bytes, top_n: int = 1):
-  results = [(score(xor(bstr, i)), xor(bstr,i)) for i in range(0, 256)]
-  results.sort(reverse=True)
-  return results[:top_n]
+# - the lines are scanned in batches and only the top_k best are kept, so this
+#   also works on files that are much bigger than 4.txt
+import argparse
+import heapq
+import itertools
+import pathlib
+import sys
+
+from common.batches import iter_batches, map_batches
+from common.utils import key_scores, xor
+
+
+def score_batch(lines: list) -> list:
+  """ Returns the best (score, key, hexstr) for each hex line in the batch """
+  hexstrs = [x.strip() for x in lines]
+  hexstrs = [x for x in hexstrs if x]
+  # fromhex skips whitespace inside a line, so take it out first or the
+  # offsets below (two digits a byte) would be off for every later line
+  digits = ["".join(x.split()) for x in hexstrs]
+  if any(len(x) % 2 for x in digits):
+    raise ValueError("hex line with an odd number of digits")
+  # decode the whole batch in one go, then walk it with a memoryview
+  buf = memoryview(bytes.fromhex("".join(digits)))
+  results = []
+  start = 0
+  for hexstr, line_digits in zip(hexstrs, digits):
+    end = start + len(line_digits) // 2
+    scores = key_scores(buf[start:end])
+    key = max(range(256), key=scores.__getitem__)
+    results.append((scores[key], key, hexstr))
+    start = end
+  return results
+
+
+def scan(lines, top_k: int = 1, batch_size: int = 4096, workers: int = None):
+  """ Find the lines most likely to be single-byte XOR'd text.
+
+  lines can be any iterable of hex strings (eg an open file), it is consumed
+  batch_size lines at a time. Returns [(score, key, plaintext, hexstr), ...]
+  for the top_k lines, best first.
+  """
+  if top_k < 1:
+    raise ValueError("top_k must be at least 1")
+  heap = [] # min-heap, so the worst of the top_k is always on top
+  seq = itertools.count()
+  for results in map_batches(
+      score_batch, iter_batches(lines, batch_size), workers):
+    for s, key, hexstr in results:
+      # earlier lines win ties, like the old version that used s > best
+      item = (s, -next(seq), key, hexstr)
+      if len(heap) < top_k:
+        heapq.heappush(heap, item)
+      elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+  return [(s, key, xor(bytes.fromhex(hexstr), key), hexstr)
+          for s, _, key, hexstr in sorted(heap, reverse=True)]
+
 
 def main():
-  with open("4.txt", "r") as f:
-    hexstrs = [x.strip() for x in f.readlines()]
-    best = -1
-    best_res = None
-    best_hex = None
-    for hexstr in hexstrs:
-      bstr = bytes.fromhex(hexstr)
-      s, r = best_score(bstr, 1)[0]
-      if s > best:
-        best = s
-        best_res = r
-        best_hex = hexstr
-    print(best_res, best, best_hex)
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+    "input", nargs="?", default=pathlib.Path(__file__).parent / "4.txt",
+    help="file with one hex string per line, - for stdin")
+  parser.add_argument("--top", type=int, default=1)
+  parser.add_argument("--batch-size", type=int, default=4096)
+  parser.add_argument("--workers", type=int, default=None)
+  args = parser.parse_args()
+
+  if str(args.input) == "-":
+    res = scan(sys.stdin, args.top, args.batch_size, args.workers)
+  else:
+    with open(args.input, "r") as f:
+      res = scan(f, args.top, args.batch_size, args.workers)
+  for s, _, plaintext, hexstr in res:
+    print(plaintext, s, hexstr)
 
 if __name__ == "__main__":
   main()
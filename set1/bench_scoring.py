@@ -0,0 +1,70 @@
+# Compare the common.scoring backends on challenges 4 and 6
+# - for each scorer, time finding the encrypted line in 4.txt and the
+#   repeating key of 6.txt, and check that the answer is the right one
+# - the "+reject" variants turn on early rejection of candidates that are
+#   mostly non-printable, which is most of the 327 junk lines in 4.txt
+import argparse
+import base64
+import pathlib
+import time
+
+from common.scoring import (
+  ChiSquaredScorer, FrequencyScorer, LogLikelihoodScorer, PrintableScorer)
+from common.utils import best_score, crack_rkey_xor
+
+HERE = pathlib.Path(__file__).parent
+ANSWER_4 = b"Now that the party is jumping\n"
+ANSWER_6 = b"Terminator X: Bring the noise"
+
+
+def scorers(max_nonprintable: float) -> dict:
+  res = {}
+  for name, cls in [
+      ("frequency", FrequencyScorer),
+      ("chi-squared", ChiSquaredScorer),
+      ("log-likelihood", LogLikelihoodScorer),
+      ("printable", PrintableScorer)]:
+    res[name] = cls()
+    res[name + "+reject"] = cls(max_nonprintable=max_nonprintable)
+  return res
+
+
+def detect_line(lines: list, scorer) -> bytes:
+  """ The plaintext of the best scoring line / key over all lines """
+  best = None
+  for line in lines:
+    key, s, txt = best_score(line, scorer=scorer)[0]
+    if best is None or s > best[0]:
+      best = (s, txt)
+  return best[1]
+
+
+def timed(fn, *args, **kwargs):
+  start = time.perf_counter()
+  res = fn(*args, **kwargs)
+  return res, time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Time the common.scoring scorers on challenges 4 and 6")
+  parser.add_argument("--max-nonprintable", type=float, default=0.1,
+                      help="fraction of non-printable bytes to reject at")
+  args = parser.parse_args()
+
+  with open(HERE / "4.txt") as f:
+    lines = [bytes.fromhex(x.strip()) for x in f if x.strip()]
+  with open(HERE / "6.txt") as f:
+    bstr = base64.b64decode(f.read())
+
+  print(f"{'scorer':<24}{'4 (s)':>8}{'ok':>7}{'6 (s)':>8}{'ok':>7}")
+  for name, scorer in scorers(args.max_nonprintable).items():
+    txt, t4 = timed(detect_line, lines, scorer)
+    res, t6 = timed(crack_rkey_xor, bstr, 2, 40, scorer=scorer)
+    key = res[0][0][1]
+    print(f"{name:<24}{t4:>8.3f}{str(txt == ANSWER_4):>7}"
+          f"{t6:>8.3f}{str(key == ANSWER_6):>7}")
+
+
+if __name__ == "__main__":
+  main()
@@ -2,6 +2,8 @@ import os
 import Crypto.Cipher.AES
 from Crypto.Cipher.AES import MODE_CBC, MODE_ECB
 
+from common.oracle import InstrumentedOracle
+
 
 def detect_ecb(cipher):
   blocks = [cipher[i:i+16] for i in range(0, len(cipher), 16)]
@@ -49,8 +51,19 @@ def detect_mode(
 
 def main():
   key_size = 16
-  k, m, ct = encryption_oracle(b"YellOw SUbmarine", key_size)
-  print(f"mode: {m}, detected: {detect_mode(ct)}")
+  modes = []
+
+  def ciphertext_oracle(bstr: bytes) -> bytes:
+    # what the attacker actually gets back - keep the mode to check against
+    _, mode, ct = encryption_oracle(bstr, key_size)
+    modes.append(mode)
+    return ct
+
+  oracle = InstrumentedOracle(ciphertext_oracle)
+  with oracle.phase("detection"):
+    ct = oracle(b"YellOw SUbmarine")
+  print(f"mode: {modes[-1]}, detected: {detect_mode(ct)}")
+  print(oracle.summary())
 
 
 if __name__ == "__main__":
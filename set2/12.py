@@ -1,9 +1,12 @@
 # Cryptopals Set 2, Challenge 12 - Byte-at-a-time ECB decryption (Simple)
+import argparse
 import base64
 import os
 import Crypto.Cipher.AES
 from Crypto.Cipher.AES import MODE_CBC, MODE_ECB
 
+from common.oracle import CachedOracle, InstrumentedOracle
+
 
 UNKNOWN = "Um9sbGluJyBpbiBteSA1LjAKV2l0aCBteSByYWctdG9wIGRvd24gc28gbXkgaGFpciBjYW4gYmxvdwpUaGUgZ2lybGllcyBvbiBzdGFuZGJ5IHdhdmluZyBqdXN0IHRvIHNheSBoaQpEaWQgeW91IHN0b3A/IE5vLCBJIGp1c3QgZHJvdmUgYnkK"
 
@@ -101,25 +104,75 @@ def crack_ecb(oracle, block_size: int) -> bytes:
   return unknown_str
 
 
+def dictionary_query(window: bytes, pad_len: int) -> bytes:
+  # all 256 candidate blocks back to back (window + each possible byte),
+  # then pad_len filler bytes to line the unknown byte up at the end of a
+  # block, right after the dictionary
+  return b"".join(
+    [window + bytes([i]) for i in range(256)]) + b"A" * pad_len
+
+def crack_ecb_batched(oracle, block_size: int) -> bytes:
+  """ Same as crack_ecb, but with one oracle query per recovered byte.
+
+  Each query carries the whole dictionary for the next byte as well as the
+  block to look up in it, instead of 256 + 1 separate queries.
+  """
+  # the unknown string can't be longer than its (padded) ciphertext
+  max_len = len(oracle(b""))
+  dict_len = 256 * block_size
+
+  unknown_str = b""
+  while len(unknown_str) < max_len:
+    pad_len = block_size - 1 - len(unknown_str) % block_size
+    # the block_size - 1 bytes before the byte we're after, these are the
+    # filler to start with and then the end of what we've already got
+    window = (b"A" * (block_size - 1) + unknown_str)[-(block_size - 1):]
+    ct = oracle(dictionary_query(window, pad_len))
+
+    ct_map = {ct[i * block_size:(i + 1) * block_size]: bytes([i])
+              for i in range(256)}
+    # the block that ends with the next unknown byte
+    bstart = dict_len + pad_len + len(unknown_str) - (block_size - 1)
+    try:
+      unknown_str += ct_map[ct[bstart:bstart + block_size]]
+    except KeyError:
+      # past the end of the unknown string (into the padding)
+      break
+  return unknown_str
+
+
 def main():
-  # make a new oracle function
-  oracle = oracle_factory()
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--cache", action="store_true",
+                      help="don't send the oracle the same input twice")
+  args = parser.parse_args()
+
+  # make a new oracle function, and keep track of how much we use it - if
+  # caching, only the queries that actually reach the oracle get counted
+  queries = InstrumentedOracle(oracle_factory())
+  oracle = CachedOracle(queries) if args.cache else queries
 
   # detect that it's using ECB mode
-  if not detect_ecb(oracle(b"A" * 100)):
-    print("ECB not detected!")
-    return 1
+  with queries.phase("detection"):
+    if not detect_ecb(oracle(b"A" * 100)):
+      print("ECB not detected!")
+      return 1
   print("ECB detected!")
 
   # detect block size
-  if not (block_size := detect_block_size(oracle)):
-    print("Block size not detected!")
-    return 1
+  with queries.phase("block size"):
+    if not (block_size := detect_block_size(oracle)):
+      print("Block size not detected!")
+      return 1
   print(f"Block size: {block_size}")
 
   # crack it block by block
-  unknown_str = crack_ecb(oracle, block_size) 
+  with queries.phase("cracking"):
+    unknown_str = crack_ecb_batched(oracle, block_size)
   print("Decoded:\n", unknown_str.decode())
+  print(queries.summary())
+  if args.cache:
+    print(f"cache: {oracle.stats()}")
 
 
 def test():
@@ -2,12 +2,15 @@
 # same as 12, but with a random prefix of unknown length prepended to the
 # plaintext before encryption, which adds some steps (eg we need to detect the
 # prefix length first then we can crack like 12
+import argparse
 import base64
 import os
 import secrets
 import Crypto.Cipher.AES
 from Crypto.Cipher.AES import MODE_CBC, MODE_ECB
 
+from common.oracle import CachedOracle, InstrumentedOracle
+
 
 UNKNOWN = "Um9sbGluJyBpbiBteSA1LjAKV2l0aCBteSByYWctdG9wIGRvd24gc28gbXkgaGFpciBjYW4gYmxvdwpUaGUgZ2lybGllcyBvbiBzdGFuZGJ5IHdhdmluZyBqdXN0IHRvIHNheSBoaQpEaWQgeW91IHN0b3A/IE5vLCBJIGp1c3QgZHJvdmUgYnkK"
 
@@ -55,33 +58,31 @@ def has_repeated_blocks(cipher: bytes, block_size: int = 16):
   blocks = [cipher[i:i+block_size] for i in range(0, len(cipher), block_size)]
   return len(blocks) != len(set(blocks))
 
-def index_of_first_repeated_block(cipher: bytes, block_size: int = 16):
-  blocks = [cipher[i:i+block_size] for i in range(0, len(cipher), block_size)]
-  for i in range(len(blocks)):
-    if blocks[i] in blocks[i+1:]:
-      return i
+def index_of_first_double_block(cipher: bytes, block_size: int = 16):
+  # first block that is followed by an identical one, or -1
+  for i in range(block_size, len(cipher) - block_size + 1, block_size):
+    if cipher[i - block_size:i] == cipher[i:i + block_size]:
+      return i // block_size - 1
   return -1
 
 def detect_prefix_len(oracle: callable, block_size: int) -> int:
   """ Find the length of the unknown prefix prepended to the plaintext.
 
   Take two blocks of A's, and send them with X's prepended, to the oracle.
-  When we find a repeated block in the ciphertext, we know that the prefix
-  pushed our two blocks of A's so that they start on a new block.
+  When we find two identical blocks in a row in the ciphertext, we know the
+  prefix and X's pushed our two blocks of A's so that they start on a new
+  block, and everything before them is the prefix plus our X's. This works
+  for prefixes of any length. There's always at least one X, so a prefix
+  that ends in A's can't run into our A's and throw the count off.
   """
 
   two_blocks = b"A" * block_size * 2
-  prefix_len = 0
-  for i in range(block_size):
-    ct = oracle( b"X" * i + two_blocks)
-    if has_repeated_blocks(ct, block_size):
-      prefix_len = block_size - i
-      break # found it!
-  
-  # this is in case the prefix is longer than one block long
-  prefix_end_idx = index_of_first_repeated_block(ct, block_size)
-
-  return prefix_len + (prefix_end_idx - 1) * block_size
+  for i in range(1, block_size + 1):
+    ct = oracle(b"X" * i + two_blocks)
+    idx = index_of_first_double_block(ct, block_size)
+    if idx >= 0:
+      return idx * block_size - i
+  raise ValueError("no repeated blocks found, is this ECB?")
 
 def get_ct_map(
     oracle,
@@ -165,30 +166,82 @@ def crack_ecb(oracle: callable, block_size: int, prefix_len: int) -> bytes:
   return unknown_str
 
 
+def crack_ecb_shifted(
+    oracle: callable, block_size: int, prefix_len: int) -> bytes:
+  """ Same as crack_ecb, with block_size oracle calls up front and then one
+  per unknown byte.
+
+  There are only block_size different "A" * n inputs that line the unknown
+  bytes up at the end of a block, so send each of them once up front and
+  read every byte's target block out of those. The 256 dictionary blocks for
+  each byte go in a single query, back to back.
+  """
+  # X's to fill out the prefix's last block, then everything we send starts
+  # on a block boundary at block_offset
+  align = b"X" * (-prefix_len % block_size)
+  block_offset = (prefix_len + len(align)) // block_size
+  start = block_offset * block_size
+
+  shifted = [oracle(align + b"A" * n)[start:] for n in range(block_size)]
+  # the unknown string can't be longer than its (padded) ciphertext
+  max_len = len(shifted[0])
+
+  unknown_str = b""
+  while len(unknown_str) < max_len:
+    # with n A's in front, the next unknown byte ends a block
+    n = block_size - 1 - len(unknown_str) % block_size
+    bstart = n + len(unknown_str) - (block_size - 1)
+    target = shifted[n][bstart:bstart + block_size]
+
+    window = (b"A" * (block_size - 1) + unknown_str)[-(block_size - 1):]
+    ct = oracle(align + b"".join([window + bytes([i]) for i in range(256)]))
+    ct_map = {ct[start + i * block_size:start + (i + 1) * block_size]: i
+              for i in range(256)}
+    if target not in ct_map:
+      # past the end of the unknown string (into the padding)
+      break
+    unknown_str += bytes([ct_map[target]])
+  return unknown_str
+
+
 def main():
-  # make a new oracle function
-  oracle = oracle_factory()
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--cache", action="store_true",
+                      help="don't send the oracle the same input twice")
+  args = parser.parse_args()
+
+  # make a new oracle function, and keep track of how much we use it - if
+  # caching, only the queries that actually reach the oracle get counted
+  queries = InstrumentedOracle(oracle_factory())
+  oracle = CachedOracle(queries) if args.cache else queries
 
   # detect that it's using ECB mode
-  if not detect_ecb(oracle(b"A" * 128)):
-    print("ECB not detected!")
-    return 1
+  with queries.phase("detection"):
+    if not detect_ecb(oracle(b"A" * 128)):
+      print("ECB not detected!")
+      return 1
   print("ECB detected!")
 
   # detect random padding length - but do I need to get the block size first?
   # Update there's a better method to get the block size than what I was using
   # before...
-  if not (block_size := detect_block_size(oracle)):
-    print("Block size not detected!")
-    return 1
+  with queries.phase("block size"):
+    if not (block_size := detect_block_size(oracle)):
+      print("Block size not detected!")
+      return 1
   print(f"Block size: {block_size}")
 
-  prefix_len = detect_prefix_len(oracle, block_size)
+  with queries.phase("prefix"):
+    prefix_len = detect_prefix_len(oracle, block_size)
   print(f"Prefix length: {prefix_len}")
 
   # crack it block by block
-  unknown_str = crack_ecb(oracle, block_size, prefix_len) 
+  with queries.phase("cracking"):
+    unknown_str = crack_ecb_shifted(oracle, block_size, prefix_len)
   print("Decoded:\n", unknown_str.decode(errors="ignore"))
+  print(queries.summary())
+  if args.cache:
+    print(f"cache: {oracle.stats()}")
 
 
 def test():
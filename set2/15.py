@@ -1,15 +1,7 @@
 # Cryptopals Set 2, Challenge 15 - PKCS#7 padding validation
-def remove_padding(text: bytes):
-  """ Remove padding from bytes - raise ValueError if padding is invalid """
-  if len(text) == 0:
-    raise ValueError("Invalid padding")
-  padding = text[-1]
-  if padding > len(text):
-    raise ValueError("Invalid padding")
-  for i in range(1, padding + 1):
-    if text[-i] != padding:
-      raise ValueError("Invalid padding")
-  return text[:-padding]
+# the validation itself is in common/padding.py, shared with the CBC
+# challenges (and the padding oracle, where it's checked on every query)
+from common.padding import remove_padding
 
 
 def main():
@@ -0,0 +1,87 @@
+# Time common.padding against the PKCS#7 checks it replaced
+# - remove_padding_15 is the old set2/15.py version (a Python loop over the
+#   padding bytes), remove_padding_17 the old set3/17.py one (builds the
+#   expected padding to compare against on every call)
+# - each is run on valid and invalid padding, as the padding oracle sees both
+# - unpad returns None for bad padding instead of raising, so neither new
+#   check pays for an exception on the common (invalid) case
+# - valid padding on short input is roughly a tie with set3/17 (a view costs
+#   about what copying 64 bytes does), try --size 4096 to see the view pay off
+import argparse
+import os
+import timeit
+
+from common.padding import is_valid_padding, pad, unpad
+
+
+def remove_padding_15(text: bytes):
+  if len(text) == 0:
+    raise ValueError("Invalid padding")
+  padding = text[-1]
+  if padding > len(text):
+    raise ValueError("Invalid padding")
+  for i in range(1, padding + 1):
+    if text[-i] != padding:
+      raise ValueError("Invalid padding")
+  return text[:-padding]
+
+
+def remove_padding_17(text: bytes, block_size: int = 16):
+  last_byte = text[-1]
+  if last_byte > block_size:
+    raise ValueError("Invalid padding")
+  if text[-last_byte:] != bytes([last_byte] * last_byte):
+    raise ValueError("Invalid padding")
+  return text[:-last_byte]
+
+
+def as_check(remove_padding):
+  # the padding oracle only wants a yes / no
+  def check(data) -> bool:
+    try:
+      remove_padding(data)
+      return True
+    except ValueError:
+      return False
+  return check
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Time the PKCS#7 padding checks")
+  parser.add_argument("--number", type=int, default=200_000)
+  parser.add_argument("--size", type=int, default=64,
+                      help="bytes of plaintext (before padding)")
+  args = parser.parse_args()
+
+  valid = pad(os.urandom(args.size), 16)
+  # a plausible pad value that doesn't check out - the slow case
+  invalid = bytearray(valid)
+  invalid[-1] = (invalid[-1] % 15) + 2
+  invalid[-2] ^= 0xff
+  invalid = bytes(invalid)
+  # what the padding oracle decrypts most of the time
+  garbage = valid[:-1] + b"\xff"
+
+  unpad_check = lambda data: unpad(data) is not None
+  checks = {
+    "set2/15 remove_padding": (as_check(remove_padding_15), bytes),
+    "set3/17 remove_padding": (as_check(remove_padding_17), bytes),
+    "unpad": (unpad_check, bytes),
+    # a caller already holding a view (e.g. over a decrypt buffer)
+    "unpad (view)": (unpad_check, memoryview),
+    "is_valid_padding": (is_valid_padding, bytes),
+  }
+  inputs = {"valid": valid, "invalid": invalid, "garbage": garbage}
+  print(f"{'(ns per check)':<26}" + "".join(f"{k:>10}" for k in inputs))
+  for name, (check, wrap) in checks.items():
+    data = {k: wrap(v) for k, v in inputs.items()}
+    assert check(data["valid"]) and not check(data["invalid"]), name
+    times = [timeit.timeit(lambda: check(d), number=args.number)
+             for d in data.values()]
+    print(f"{name:<26}" + "".join(
+      f"{t / args.number * 1e9:>10.0f}" for t in times))
+
+
+if __name__ == "__main__":
+  main()
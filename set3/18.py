@@ -1,30 +1,10 @@
 # Set 3, Challenge 18: Implement CTR, the stream cipher mode
 import base64
-from Crypto.Cipher import AES
-from common.utils import repeating_xor
+from common.ctr import ctr_encrypt
 
 
-def ctr_encrypt(
-    pt_or_ct: bytes = None,
-    key: bytes = None,
-    nonce: int = 0) -> bytes:
-  result = b""
-  # for each block of the plaintext, generate a keystream, xor it
-  for iblock in range(0, len(pt_or_ct), len(key)):
-    keystream = ctr_key_stream(key, nonce, len(key))
-    bend = min(iblock + len(key), len(pt_or_ct)) # last block may be shorter
-    pt_block = pt_or_ct[iblock:bend]
-    result += repeating_xor(pt_block, keystream)
-    nonce += 1
-  return result
-
-
-def ctr_key_stream(key, nonce, block_size):
-  nonce_bytes = nonce.to_bytes(8, byteorder="little")
-  # pad nonce to block size with 0s (left padding as in example)
-  nonce_bytes = b"\x00" * (block_size - len(nonce_bytes)) + nonce_bytes
-  keystream = AES.new(key, AES.MODE_ECB).encrypt(nonce_bytes)
-  return keystream
+# ctr_encrypt used to be here, moved it to common/ctr.py to share it with the
+# next couple of challenges
 
 
 def main():
@@ -1,31 +1,10 @@
 # Set 3, Challenge 19: Break fixed-nonce CTR mode using substitutions
 import base64
-from Crypto.Cipher import AES
-
-from common.utils import repeating_xor, score
-
-
-# From challenge 18:
-def ctr_encrypt(
-    pt_or_ct: bytes = None,
-    key: bytes = None,
-    nonce: int = 0) -> bytes:
-  result = b""
-  # for each block of the plaintext, generate a keystream, xor it
-  for iblock in range(0, len(pt_or_ct), len(key)):
-    keystream = ctr_key_stream(key, nonce, len(key))
-    bend = min(iblock + len(key), len(pt_or_ct)) # last block may be shorter
-    pt_block = pt_or_ct[iblock:bend]
-    result += repeating_xor(pt_block, keystream)
-    nonce += 1
-  return result
-
-def ctr_key_stream(key, nonce, block_size):
-  nonce_bytes = nonce.to_bytes(8, byteorder="little")
-  # pad nonce to block size with 0s (left padding as in example)
-  nonce_bytes = b"\x00" * (block_size - len(nonce_bytes)) + nonce_bytes
-  keystream = AES.new(key, AES.MODE_ECB).encrypt(nonce_bytes)
-  return keystream
+import math
+
+from common.ctr import KeystreamCache, ctr_encrypt
+from common.frequency import FrequencyModel
+from common.utils import ENGLISH, key_scores, repeating_xor, xor
 
 
 example_texts_base64 = [
@@ -72,6 +51,99 @@ example_texts_base64 = [
 ]
 
 
+# bytes we expect to see in the plaintexts, and lowercase letters (which we
+# don't expect at the start of a line)
+ALLOWED = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-. ,:;\"?!'"
+LOWERCASE = b"abcdefghijklmnopqrstuvwxyz"
+
+# most common english letter pairs (percent of all pairs), from
+# https://norvig.com/mayzner.html - used to score neighbouring columns
+BIGRAM_PERCENT = {
+  "th": 3.56, "he": 3.07, "in": 2.43, "er": 2.05, "an": 1.99, "re": 1.85,
+  "on": 1.76, "at": 1.49, "en": 1.45, "nd": 1.35, "ti": 1.34, "es": 1.34,
+  "or": 1.28, "te": 1.20, "of": 1.17, "ed": 1.17, "is": 1.13, "it": 1.12,
+  "al": 1.09, "ar": 1.07, "st": 1.05, "to": 1.04, "nt": 1.04, "ng": 0.95,
+  "se": 0.93, "ha": 0.93, "as": 0.87, "ou": 0.87, "io": 0.83, "le": 0.83,
+}
+
+# the same as a FrequencyModel pair table (log10 probabilities), with every
+# pair not in the list a bit less likely than the least common one that is
+ENGLISH_BIGRAMS = FrequencyModel(
+  ENGLISH.weights,
+  {2: {tuple(pair.encode()): math.log10(percent / 100)
+       for pair, percent in BIGRAM_PERCENT.items()}},
+  {2: math.log10(0.5 / 100)})
+
+
+def get_column(cipher_texts: list, index: int) -> bytes:
+  # the index'th byte of every cipher text that's long enough - they were all
+  # xor'd with the same keystream byte
+  return bytes([ct[index] for ct in cipher_texts if index < len(ct)])
+
+
+def column_candidates(column: bytes, index: int, beam_width: int) -> list:
+  """ Returns the best [(score, keystream byte), ...] for one column.
+
+  The score is additive over positions, so each column can be scored on its
+  own. Guesses that give any byte we don't expect are dropped, unless that
+  leaves nothing (then everything is kept).
+  """
+  scores = key_scores(column)
+  candidates = []
+  for guess in range(256):
+    pt = xor(column, guess)
+    if pt.translate(None, ALLOWED):
+      continue
+    s = scores[guess]
+    if index == 0:
+      # make it costly if it doesn't start with a capital letter
+      s -= 1000 * (len(pt) - len(pt.translate(None, LOWERCASE)))
+    candidates.append((s, guess))
+  if not candidates:
+    candidates = [(scores[guess], guess) for guess in range(256)]
+  candidates.sort(reverse=True)
+  return candidates[:beam_width]
+
+
+def bigram_score(cipher_texts: list, index: int, prev: int, guess: int,
+                 bigrams: FrequencyModel) -> float:
+  # score for the pairs of letters made by guessing keystream bytes prev and
+  # guess at index - 1 and index
+  return sum([
+    bigrams.ngram_score(bytes([ct[index - 1] ^ prev, ct[index] ^ guess]))
+    for ct in cipher_texts if index < len(ct)])
+
+
+def recover_keystream(cipher_texts: list, beam_width: int = 8,
+                      bigrams: FrequencyModel = None) -> bytes:
+  """ Guess the keystream byte by byte, for the length of the longest text.
+
+  Without bigrams, the columns are independent so the best guess for each
+  one is taken. With bigrams (a model with a pair table), a beam of the
+  beam_width best keystreams so far is extended one column at a time,
+  adding the bigram score for each new pair of neighbouring columns.
+  """
+  longest = max(len(ct) for ct in cipher_texts)
+  columns = [
+    column_candidates(get_column(cipher_texts, i), i, beam_width)
+    for i in range(longest)]
+  if bigrams is None:
+    return bytes([candidates[0][1] for candidates in columns])
+
+  beam = [(0.0, b"")]
+  for i, candidates in enumerate(columns):
+    extended = []
+    for total, keystream in beam:
+      for s, guess in candidates:
+        s += total
+        if i > 0:
+          s += bigram_score(cipher_texts, i, keystream[-1], guess, bigrams)
+        extended.append((s, keystream + bytes([guess])))
+    extended.sort(reverse=True)
+    beam = extended[:beam_width]
+  return beam[0][1]
+
+
 def main():
   # Breaking CTR with a fixed nonce
   # - all the cipher texts are encrypted with the same key and nonce
@@ -86,81 +158,26 @@ def main():
 
   key = b"YELLOW SUBMARINE"
   nonce = 0
-  cipher_texts = [ctr_encrypt(base64.b64decode(text), key, nonce)
+  # same key and nonce every time, so only make the keystream once
+  cache = KeystreamCache()
+  cipher_texts = [ctr_encrypt(base64.b64decode(text), key, nonce, cache=cache)
                   for text in example_texts_base64]
 
   # Now we have the cipher texts, we can try to break them, assuming we don't
   # know the key or nonce. We will try to break them using substitutions...
-  # - we can try to find the most common byte in each position
-
-  # Now we have the possible guesses for each byte of the keystream, we can test
-  # them by xor'ing against the first block of each cipher text
-  def generate_possible_keystreams(guesses, index=0, current=[]):
-    if index == 16:
-      yield b"".join(current)
-      return
-    for guess in guesses[index]:
-      current.append(guess)
-      yield from generate_possible_keystreams(guesses, index+1, current)
-      current.pop()
-
-  # Crack block by block, for all texts
-  shortest = min(len(cipher) for cipher in cipher_texts)
-  best_keystream_per_block = []
-  for iblock in range(0, shortest, 16):
-    print(f"Block {iblock}")
-    # guess each byte of the keystream by finding bytes that seem to make sense 
-    # for all the cipher texts, just substitute in byte by byte
-    possible_guesses = {}
-    for byte_index in range(16):
-      possible_guess = []
-      # try all possible bytes
-      for guess in range(256):
-        # check if the guess is a good one (all the results are printable)
-        good_guess = True
-        for cipher_text in cipher_texts:
-          if iblock + byte_index >= len(cipher_text):
-            continue
-          decrypted = chr(cipher_text[iblock + byte_index] ^ guess)
-          if not decrypted.isprintable():
-              good_guess = False
-              break
-          if decrypted.lower() not in "abcdefghijklmnopqrstuvwxyz-. ,:;\"?!'":
-            good_guess = False
-            break
-        if good_guess:
-          possible_guess.append(bytes([guess]))
-      possible_guesses[byte_index] = possible_guess
-
-    max_score = 0
-    best_guess = None
-    for keystream in generate_possible_keystreams(possible_guesses):
-        sum_score = 0
-        for cipher_text in cipher_texts:
-          res = repeating_xor(cipher_text[iblock:16+iblock], keystream)
-          sum_score += score(res)
-          # make it costly if it doesn't start with a capital letter
-          if iblock == 0 and chr(res[0]).islower():
-            sum_score -= 1000
-        if best_guess is None or sum_score > max_score:
-          max_score = sum_score
-          best_guess = keystream
-    print(f"Score: {max_score}, keystream: {keystream}")
-    best_keystream_per_block.append(best_guess)
-
-
-  # Nice - use the probable keystream for each block to see what we got!
-  plain_texts = []
-  for cipher_text in cipher_texts:
-    pt = b""
-    for iblock in range(0, shortest, 16):
-      keystream = best_keystream_per_block[iblock // 16]
-      end = min(iblock + 16, len(cipher_text))
-      pt += repeating_xor(cipher_text[iblock:end], keystream)
-    plain_texts.append(pt)
+  # - every byte of the keystream is used at the same position in every
+  #   cipher text, so we can guess it one position (column) at a time
+  # - keep the guesses that make every text in that column look like text
+  #   and pick the best scoring one
+  # - optionally, look at neighbouring columns together using common pairs
+  #   of letters, which helps further out where there are fewer texts
+  keystream = recover_keystream(cipher_texts, bigrams=ENGLISH_BIGRAMS)
+  print(f"Keystream: {keystream}")
+
+  # Nice - use the probable keystream to see what we got!
   print("Decrypted texts:")
-  for text in plain_texts:
-    print(text)
+  for cipher_text in cipher_texts:
+    print(repeating_xor(cipher_text, keystream[:len(cipher_text)]))
 
 
 if __name__ == "__main__":
@@ -1,33 +1,11 @@
 # Set 3, Challenge 20: Break fixed-nonce CTR mode statistically
 import base64
 import pathlib
-from Crypto.Cipher import AES
+from array import array
+from itertools import accumulate
 
-from common.utils import repeating_xor, crack_rkey_xor
-
-
-# From challenge 18:
-def ctr_encrypt(
-    pt_or_ct: bytes = None,
-    key: bytes = None,
-    nonce: int = 0) -> bytes:
-  result = b""
-  # for each block of the plaintext, generate a keystream, xor it
-  for iblock in range(0, len(pt_or_ct), len(key)):
-    keystream = ctr_key_stream(key, nonce, len(key))
-    bend = min(iblock + len(key), len(pt_or_ct)) # last block may be shorter
-    pt_block = pt_or_ct[iblock:bend]
-    result += repeating_xor(pt_block, keystream)
-    nonce += 1
-  return result
-
-
-def ctr_key_stream(key, nonce, block_size):
-  nonce_bytes = nonce.to_bytes(8, byteorder="little")
-  # pad nonce to block size with 0s (left padding as in example)
-  nonce_bytes = b"\x00" * (block_size - len(nonce_bytes)) + nonce_bytes
-  keystream = AES.new(key, AES.MODE_ECB).encrypt(nonce_bytes)
-  return keystream
+from common.ctr import KeystreamCache, ctr_encrypt
+from common.utils import best_key_byte, repeating_xor
 
 
 def get_char_freq(text: str) -> dict:
@@ -43,6 +21,39 @@ def get_char_freq(text: str) -> dict:
   return freq
 
 
+def pack_texts(cipher_texts: list):
+  """ Put all the cipher texts in one buffer, longest first.
+
+  Returns (buf, offsets, lengths), text i is at buf[offsets[i]:][:lengths[i]].
+  Sorting longest first means the texts that are long enough to reach any
+  given position are always the first few.
+  """
+  ordered = sorted(cipher_texts, key=len, reverse=True)
+  lengths = array("I", map(len, ordered))
+  offsets = array("Q", accumulate(lengths, initial=0))[:-1]
+  return b"".join(ordered), offsets, lengths
+
+
+def break_fixed_nonce_ctr(cipher_texts: list, frequency_map=None) -> bytes:
+  """ Recover the keystream, up to the length of the longest cipher text.
+
+  Byte i of every cipher text was xor'd with byte i of the keystream, so
+  each position (column) is a single-byte XOR problem, using whichever texts
+  are long enough to have a byte there.
+  """
+  buf, offsets, lengths = pack_texts(cipher_texts)
+  keystream = bytearray()
+  count = len(lengths)
+  for index in range(lengths[0] if count else 0):
+    # drop the texts that end before this column (they're at the end)
+    while lengths[count - 1] <= index:
+      count -= 1
+    column = bytes(map(
+      buf.__getitem__, [offset + index for offset in offsets[:count]]))
+    keystream.append(best_key_byte(column, frequency_map))
+  return bytes(keystream)
+
+
 def main():
   # Breaking CTR with a fixed nonce part 2 (challenge 20)
   # - all the cipher texts are encrypted with the same key and nonce
@@ -58,34 +69,30 @@ def main():
   key = b"YELLOW SUBMARINE"
   nonce = 0
   texts = [base64.b64decode(text) for text in example_texts_base64]
-  cipher_texts = [ctr_encrypt(text, key, nonce) for text in texts]
+  # same key and nonce every time, so only make the keystream once
+  cache = KeystreamCache()
+  cipher_texts = [ctr_encrypt(text, key, nonce, cache=cache) for text in texts]
 
   # Turns out the CTR with a fixed nonce and key is basically the same as
   # repeating-key XOR, so we can use the same technique we used in the
-  # ealier challenges to break it. From the problem statement:
-  #   - truncate all the cipher texts to the length of the shortest one
-  #   - concatenate the cipher texts
-  #   - break the repeating-key XOR (with key size equal to the shortest one)
-  shortest_len = min(len(ct) for ct in cipher_texts)
-  print("Shortest length:", shortest_len)
-  cipher_texts_cat = b"".join([ct[:shortest_len] for ct in cipher_texts])
-  res = crack_rkey_xor(
-    cipher_texts_cat,
-    min_key_size=shortest_len,
-    max_key_size=shortest_len,
-    top_n=3)[0]
-  for score, key, plain_text in res:
-    print("Cracked score:", score)
-    print("Cracked key:", key)
-    print("Length of cracked key:", len(key))
-    # print shortest len chunks of the plain text to compare
-    for i in range(0, len(plain_text), shortest_len):
-      print(plain_text[i:i+shortest_len])
-      print(texts[i // shortest_len][:shortest_len])
-      print()
-      if i // shortest_len > 5:
-        break
-
+  # ealier challenges to break it. The problem statement suggests truncating
+  # all the cipher texts to the length of the shortest one, concatenating
+  # them and using the repeating-key XOR crack - but that throws away the
+  # ends of the longer texts. Instead go column by column over all of them,
+  # the key size is already known.
+  keystream = break_fixed_nonce_ctr(cipher_texts)
+  print("Longest length:", len(keystream))
+  print("Cracked keystream:", keystream)
+
+  actual = cache.keystream(key, nonce, 0, len(keystream) // 16 + 1)
+  correct = sum(a == b for a, b in zip(keystream, actual))
+  print(f"Correct keystream bytes: {correct}/{len(keystream)}")
+  print()
+
+  for text, cipher_text in list(zip(texts, cipher_texts))[:6]:
+    print(repeating_xor(cipher_text, keystream[:len(cipher_text)]))
+    print(text)
+    print()
 
 
 if __name__ == "__main__":
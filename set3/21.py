@@ -9,79 +9,11 @@ import random
 # Note: I'm using HMACs computed with RNG output as the key instead of the raw
 # numbers generated by the RNG, because it's relevant to another challenge I'm
 # working on
+#
+# The MT19937 implementation itself is in common/mt19937.py now, shared with
+# challenges 23 and 24
 
-class MT19937:
-
-  # buncha constants
-  f = 1812433253
-  w, n, m, r = 32, 624, 397, 31
-  a = 0x9908B0DF
-  u, d = 11, 0xFFFFFFFF
-  s, b = 7, 0x9D2C5680
-  t, c = 15, 0xEFC60000
-  l = 18
-
-  def __init__(self, seed: int):
-    # init 
-    self.MT = [0] * self.n  # state
-
-    # masking for 32 bit ints 
-    self.lower_mask = (1 << self.r) - 1
-    self.upper_mask = (1 << self.r)
-
-    # index
-    self.index = self.n + 1
-
-    # init state for the first time
-    self.seed_mt(seed)
-  
-  def seed_mt(self, seed: int):
-    # Initialize the generator from a seed
-    self.index = self.n
-    self.MT[0] = seed
-    for i in range(1, self.n):
-      self.MT[i] = self.f * (
-        (self.MT[i-1] ^ (self.MT[i-1] >> (self.w-2))) + i)
-      self.MT[i] &= self.lower_mask
-
-  def extract_number(self):
-    if self.index >= self.n:
-      if self.index > self.n:
-        raise Exception("Generator was never seeded")
-      self._twist() 
-
-    y = self.MT[self.index]
-    y ^= (( y >> self.u) & self.d)
-    y ^= (( y << self.s) & self.b)
-    y ^= (( y << self.t) & self.c)
-    y ^= ( y >> self.l)
-    self.index += 1
-    return y & self.lower_mask
-
-  def _twist(self):
-    for i in range(self.n):
-      x = (self.MT[i] & self.upper_mask) | (
-        self.MT[ (i+1) % self.n] & self.lower_mask )
-      xA = x >> 1
-      if x % 2 != 0:
-        xA ^= self.a
-      self.MT[i] = self.MT[(i + self.m) % self.n] ^ xA
-    self.index = 0
-  
-  def getrandbits(self, k: int) -> int:
-    # get k random bits
-    if k <= 0:
-      raise ValueError("number of bits must be greater than zero")
-    if k <= 32:
-      # just get the last k bits of the number
-      return self.extract_number() & ((1 << k) - 1)
-    # we need to get more than 32 bits so we need to get
-    # multiple random numbers      
-    res = 0
-    for i in range(k // 32):
-      res <<= 32
-      res |= self.extract_number()
-    return res & ((1 << k) - 1) 
+from common.mt19937 import MT19937, MultiMT19937, seed_batches
 
 
 def main():
@@ -131,7 +63,7 @@ def get_valid_keys(vals: list, key_size: int) -> list:
     yield key
 
 
-def test_attack():
+def test_attack(batch_size: int = 256):
   # Test attack - More or less, this is Set 3 Challenge 22
   # I've modified it to practice for another challenge, eg using HMACs instead
   # of only the numbers generated by the RNG
@@ -160,42 +92,44 @@ def test_attack():
   extract_per_seed = 1000
   k = 0
   found = False
-  # brute force the seed and key, start at now and go backwards
-  for seed in range(int(time.time()), 0, -1):
+  # brute force the seed and key, start at now and go backwards - a batch of
+  # seeds at a time, all seeded and run side by side
+  for seeds in seed_batches(int(time.time()), batch_size):
 
-    if found:
-      break
+    # how many numbers to pull for each seed
+    outputs = MultiMT19937(seeds).extract_many(extract_per_seed)
 
-    # set up with the seed we want to test
-    mt = MT19937(seed)
+    for seed, vals in zip(seeds, outputs):
 
-    # how many numbers to pull for this seed
+      if found:
+        break
 
-    vals = [mt.extract_number() for _ in range(extract_per_seed)]
+      for key in get_valid_keys(vals, 256):
 
-    for key in get_valid_keys(vals, 256):
+        k += 1
 
-      k += 1
-  
-      # get hmac of plaintext using key (little endian)
-      h = hmac.new(key.to_bytes(32, "little"), msg, digestmod="md5")
-      if h.hexdigest() == target:
-        print(f"found seed: {seed}, key: {key}, little endian")
-        found = True
-        break
+        # get hmac of plaintext using key (little endian)
+        h = hmac.new(key.to_bytes(32, "little"), msg, digestmod="md5")
+        if h.hexdigest() == target:
+          print(f"found seed: {seed}, key: {key}, little endian")
+          found = True
+          break
 
-      # get hmac of plaintext using key (big endian)
-      h = hmac.new(key.to_bytes(32, "big"), msg, digestmod="md5")
-      if h.hexdigest() == target:
-        print(f"found seed: {seed}, key: {key}, big endian")
-        found = True
-        break
+        # get hmac of plaintext using key (big endian)
+        h = hmac.new(key.to_bytes(32, "big"), msg, digestmod="md5")
+        if h.hexdigest() == target:
+          print(f"found seed: {seed}, key: {key}, big endian")
+          found = True
+          break
+
+        if k % 100_000 == 0:
+          print(k, seed, actual_seed)
 
-      if k % 100_000 == 0:
-        print(k, seed, actual_seed)
+        if seed < actual_seed:
+          print("you missed it :(")
 
-      if seed < actual_seed:
-        print("you missed it :(")
+    if found:
+      break
 
 
 if __name__ == "__main__":
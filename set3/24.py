@@ -3,93 +3,18 @@ import os
 import random
 import time
 
-# This is from the MT19937 implementation in the previous challenges, just
-# copy/pasta it here because I don't think we'll need it other places
-
-class MT19937:
-
-  # buncha constants
-  f = 1812433253
-  w, n, m, r = 32, 624, 397, 31
-  a = 0x9908B0DF
-  u, d = 11, 0xFFFFFFFF
-  s, b = 7, 0x9D2C5680
-  t, c = 15, 0xEFC60000
-  l = 18
-
-  def __init__(self, seed: int):
-    # init 
-    self.MT = [0] * self.n  # state
-
-    # masking for 32 bit ints 
-    self.lower_mask = (1 << self.r) - 1
-    self.upper_mask = (1 << self.r)
-
-    # index
-    self.index = self.n + 1
-
-    # init state for the first time
-    self.seed_mt(seed)
-  
-  def seed_mt(self, seed: int):
-    # Initialize the generator from a seed
-    self.index = self.n
-    self.MT[0] = seed
-    for i in range(1, self.n):
-      self.MT[i] = self.f * (
-        (self.MT[i-1] ^ (self.MT[i-1] >> (self.w-2))) + i)
-      self.MT[i] &= self.lower_mask
-
-  def extract_number(self):
-    if self.index >= self.n:
-      if self.index > self.n:
-        raise Exception("Generator was never seeded")
-      self._twist() 
-
-    y = self.MT[self.index]
-    y ^= (( y >> self.u) & self.d)
-    y ^= (( y << self.s) & self.b)
-    y ^= (( y << self.t) & self.c)
-    y ^= ( y >> self.l)
-    self.index += 1
-    return y & self.lower_mask
-
-  def _twist(self):
-    for i in range(self.n):
-      x = (self.MT[i] & self.upper_mask) | (
-        self.MT[ (i+1) % self.n] & self.lower_mask )
-      xA = x >> 1
-      if x % 2 != 0:
-        xA ^= self.a
-      self.MT[i] = self.MT[(i + self.m) % self.n] ^ xA
-    self.index = 0
-  
-  def getrandbits(self, k: int) -> int:
-    # get k random bits
-    if k <= 0:
-      raise ValueError("number of bits must be greater than zero")
-    if k <= 32:
-      # just get the last k bits of the number
-      return self.extract_number() & ((1 << k) - 1)
-    # we need to get more than 32 bits so we need to get
-    # multiple random numbers      
-    res = 0
-    for i in range(k // 32):
-      res <<= 32
-      res |= self.extract_number()
-    return res & ((1 << k) - 1) 
-
-
-# Make a stream cipher from the MT19937 PRNG with a 16-bit seed
+# MT19937 is shared with the previous challenges now
+from common.mt19937 import MT19937
+from common.xor import xor_bytes
+
+
 def mt19937_stream_cipher_encrypt(seed: int, plaintext: bytes) -> bytes:
   # create the PRNG
   prng = MT19937(seed)
-  # encrypt the plaintext
-  ciphertext = b''
-  for i in range(len(plaintext)):
-    key = prng.getrandbits(8)
-    ciphertext += bytes([plaintext[i] ^ key])
-  return ciphertext
+  # encrypt the plaintext - the keystream is getrandbits(8) for each byte,
+  # but with all the outputs pulled in one go
+  keystream = bytes([x & 0xff for x in prng.extract_many(len(plaintext))])
+  return xor_bytes(plaintext, keystream)
 
 def mt19937_stream_cipher_decrypt(seed: int, ciphertext: bytes) -> bytes:
   """ It's the same but this is for clarity"""
@@ -2,6 +2,8 @@ import hmac
 import time
 import random
 
+from common.mt19937 import MultiMT19937, seed_batches
+
 # oracle like function to generate a random key and hmac of a message that
 # uses a poorly seeded mt19937 and that us "unknown" to the attacker
 def hmac_md5_random_key(
@@ -47,7 +49,7 @@ def get_valid_keys(vals: list, key_size: int = 256) -> list:
     yield key
 
 
-def test_attack():
+def test_attack(batch_size: int = 256):
   # Test attack - More or less, this is Set 3 Challenge 22
   # I've modified it to practice for another challenge, eg using HMACs made
   # from key = getrandbit() instead of only the numbers generated by the RNG
@@ -72,37 +74,39 @@ def test_attack():
   # - hmac the msg with the key and see if it matches the target mac
   extract_per_seed = 1000
   k = 0
-  # brute force the seed and key, start at now and go backwards
-  for seed in range(int(time.time()), 0, -1):
+  # brute force the seed and key, start at now and go backwards - a batch of
+  # seeds at a time, seeded the same way as random.seed(seed) but all at once
+  for seeds in seed_batches(int(time.time()), batch_size):
 
-    # set up with the seed we want to test
-    random.seed(seed)
+    # extract depth 32 bit ints from the rng for each seed (the same as
+    # random.getrandbits(32)) and use them to make keys
+    outputs = MultiMT19937(seeds, python_seed=True).extract_many(
+      extract_per_seed)
 
-    # extract depth 32 bit ints from the rng and use them to make keys
-    vals = [random.getrandbits(32) for _ in range(extract_per_seed)]
+    for seed, vals in zip(seeds, outputs):
 
-    for key in get_valid_keys(vals, 256):
-  
-      # get hmac of plaintext using key (little endian)
-      h = hmac.new(key.to_bytes(32, "little"), msg, digestmod="md5")
-      if h.hexdigest() == target:
-        print(f"found seed: {seed}, key: {key}, little endian")
-        return
-
-      # get hmac of plaintext using key (big endian)
-      h = hmac.new(key.to_bytes(32, "big"), msg, digestmod="md5")
-      if h.hexdigest() == target:
-        print(f"found seed: {seed}, key: {key}, big endian")
-        return
-
-      if k % 100_000 == 0:
-        print(k, seed, actual_seed)
-
-      if seed < actual_seed:
-        print("you missed it :(")
-        return
-
-      k += 1
+      for key in get_valid_keys(vals, 256):
+
+        # get hmac of plaintext using key (little endian)
+        h = hmac.new(key.to_bytes(32, "little"), msg, digestmod="md5")
+        if h.hexdigest() == target:
+          print(f"found seed: {seed}, key: {key}, little endian")
+          return
+
+        # get hmac of plaintext using key (big endian)
+        h = hmac.new(key.to_bytes(32, "big"), msg, digestmod="md5")
+        if h.hexdigest() == target:
+          print(f"found seed: {seed}, key: {key}, big endian")
+          return
+
+        if k % 100_000 == 0:
+          print(k, seed, actual_seed)
+
+        if seed < actual_seed:
+          print("you missed it :(")
+          return
+
+        k += 1
 
 
 if __name__ == "__main__":
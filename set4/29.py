@@ -1,6 +1,8 @@
 # Set 4, Challenge 29: Break a SHA-1 keyed MAC using length extension
 import sha1
 
+from common.oracle import InstrumentedOracle
+
 
 def sha1_mac(key: bytes, message: bytes) -> str:
   return sha1.sha1(key + message)
@@ -47,8 +49,8 @@ def main():
   # mac generator with 'unknown' key
   mac_generator = get_mac_generator(key)
 
-  # mac verifier with 'unknown' key
-  mac_verifier = get_mac_verifier(key)
+  # mac verifier with 'unknown' key, counting how often we ask it
+  mac_verifier = InstrumentedOracle(get_mac_verifier(key), "mac_verifier")
 
   # generate a mac for a message
   msg = b"comment1=cooking%20MCs;userdata=foo;comment2=%20like%20a%20pound%20of%20bacon"
@@ -56,8 +58,9 @@ def main():
   print(f"msg.mac: {msg.decode()}.{mac}")
 
   # check if the mac is valid (should return True, we just generated it)
-  if mac_verifier(msg, mac):
-    print("MAC is valid! (expected)")
+  with mac_verifier.phase("checks"):
+    if mac_verifier(msg, mac):
+      print("MAC is valid! (expected)")
   
   # test that md_pad works (we normally don't know the key,
   # this is just to test the padding function)
@@ -66,8 +69,9 @@ def main():
   
   # modify the message, the mac should be invalid
   new_msg = b"comment1=cooking%20MCs;userdata=foo;comment2=%20like%20a%20pound%20of%20bacon;admin=true"
-  if not mac_verifier(new_msg, mac):
-    print("MAC is invalid after modification! (expected)")
+  with mac_verifier.phase("checks"):
+    if not mac_verifier(new_msg, mac):
+      print("MAC is invalid after modification! (expected)")
   
   # Break the sha1 mac - length extension attack
   print("\nBreaking the SHA1 MAC using a length extension attack...")
@@ -99,13 +103,16 @@ def main():
     padded_msg += evil
 
     # check if the new mac is valid against the 'secret key'
-    if mac_verifier(padded_msg, new_mac):
+    with mac_verifier.phase("forging"):
+      valid = mac_verifier(padded_msg, new_mac)
+    if valid:
       print(f"  MAC is valid after modification with key length: {kl}")
       print(f"  Original MAC: {mac}")
       print(f"  New MAC: {new_mac}")
       print(f"  Original Message: {msg}")
       print(f"  Evil Message: {padded_msg}")
       break
+  print(mac_verifier.summary())
 
 
 if __name__ == "__main__":